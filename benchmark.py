@@ -0,0 +1,269 @@
+'''
+Benchmarks the stages of archiving phase and evaluation on synthetic sensor data streams.
+Reports time, throughput, and memory of each stage as json, optionally compared to a saved baseline.
+'''
+
+
+import sys
+import os
+import time
+import json
+import argparse
+import resource
+import tempfile
+import shutil
+import tracemalloc
+from itertools import count, filterfalse
+import numpy as np
+import ccarchive
+from ccarchive import channel
+from ccarchive import collect_data
+from ccarchive import sensorfile
+
+
+# Number of samples of synthetic streams
+SAMPLES = [10**3, 10**5]
+# Fraction of the value range of a stream that is archived
+DENSITIES = [0.5]
+# Scalar reference implementations process at most this many samples
+SCALAR_LIMIT = 10**5
+# Maximum change between consecutive synthetic values (scaled to integers, i.e. 4 decimal places)
+MAX_STEP = 50
+# Number of files (days) the samples of collect_days() are spread across
+NUM_DAYS = 2
+NN_THRESHOLD = 100
+# Stages slower than baseline by more than this fraction are reported as regressions
+TOLERANCE = 0.2
+# Timings below this duration (seconds) are not compared to baseline
+MIN_SECONDS = 0.005
+SEED = 2502
+# Unit of the number of samples processed by a stage (and of its samples_per_s) if it is not the number of stream values
+ARCHIVED_VALUES = "archived values"
+SAMPLE_UNITS = {"map_nearest_new": ARCHIVED_VALUES, "find_nearest_new": ARCHIVED_VALUES,
+                "compute_compressibility": "values compressed, summed over all (overlapping) windows"}
+STREAM_VALUES = "stream values"
+
+
+# Random walk of sensor values with 4 decimal places, returned as floats and scaled integers
+def synth_stream(num_samples, rng, start=2000000):
+    steps = rng.integers(-MAX_STEP, MAX_STEP+1, num_samples)
+    data_as_int = np.clip(start + np.cumsum(steps), 0, collect_data.MAXVAL)
+    return data_as_int / 10000, data_as_int
+
+
+# Archive of given fraction of the range of stream values, as (values, lower, upper), see archivefile.py
+def synth_archive(data_as_int, density, rng):
+    low, high = int(data_as_int.min()), int(data_as_int.max())
+    values = low + np.flatnonzero(rng.random(high - low + 1) < density)
+    if len(values) == 0:
+        values = np.array([low], dtype=np.int64)
+    lower, upper = collect_data.map_nearest_new(values)
+    return values, lower, upper
+
+
+# Peak resident set size (kB) of the process so far, includes all previous stages
+def get_peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Each stage function processes the prepared data and returns the number of samples processed
+def stage_collect_days(ctx):
+    # Synthetic files are parsed (and their columns cached) within the temporary directory, each run parses them again
+    cwd = os.getcwd()
+    os.chdir(ctx["tmpdir"])
+    shutil.rmtree(sensorfile.COLUMN_CACHE_DIR, ignore_errors=True)
+    try:
+        collect_data.collect_days(ctx["day_fnames"])
+    finally:
+        os.chdir(cwd)
+    return len(ctx["data"])
+
+
+def stage_map_nearest_new(ctx):
+    collect_data.map_nearest_new(ctx["archive"][0])
+    return len(ctx["archive"][0])
+
+
+def stage_find_nearest_new(ctx):
+    values = ctx["archive"][0][:ctx["scalar_limit"]].tolist()
+    # Gaps generated as in the archiving phase before map_nearest_new()
+    gapgen = (filterfalse(set(values).__contains__, count(values[0])))
+    lower = values[0] - 1
+    upper = next(gapgen)
+    for datum in values:
+        _, lower, upper = collect_data.find_nearest_new(datum, gapgen, lower, upper)
+    return len(values)
+
+
+def stage_embed_cc(ctx):
+    ccarchive.embed_cc(ctx["data"], ctx["secret_bits"], ctx["archive"], NN_THRESHOLD, np.random.default_rng(SEED))
+    return len(ctx["data"])
+
+
+def stage_create_cc_data(ctx):
+    input_data = ctx["data"][:ctx["scalar_limit"]].tolist()
+    channel.create_cc_data(input_data, os.path.join(ctx["tmpdir"], "cc.bin"), iter(ctx["secret_bits"].tolist()), ctx["neighbors"], NN_THRESHOLD)
+    return len(input_data)
+
+
+def stage_find_nearest(ctx):
+    archive = ctx["archive"][0].tolist()
+    data_as_int = ctx["data_as_int"][:ctx["scalar_limit"]].tolist()
+    for datum in data_as_int:
+        channel.find_nearest(datum, archive)
+    return len(data_as_int)
+
+
+def stage_create_regular_output(ctx):
+    ccarchive.create_regular_output(ctx["data"], ctx["stream_fname"])
+    return len(ctx["data"])
+
+
+def stage_compute_bigrams_multi(ctx):
+    ccarchive.compute_bigrams_multi(ctx["stream_fname"], ccarchive.NUM_LAST_DIGITS)
+    return len(ctx["data"])
+
+
+def stage_compute_bigrams(ctx):
+    ccarchive.compute_bigrams(ctx["scalar_stream_fname"], 2**ccarchive.NUM_LAST_DIGITS[0])
+    return min(len(ctx["data"]), ctx["scalar_limit"])
+
+
+def stage_compute_compressibility(ctx):
+    with open(ctx["stream_fname"], 'rb') as sf:
+        data = sf.read(ccarchive.COMPRESSION_STRIDE*ccarchive.COMPRESSION_NUM_WINDOWS + ccarchive.COMPRESSION_WINDOW)
+    ccarchive.compute_compressibility(data)
+    # Samples compressed in all windows (windows at the end of shorter streams are truncated or empty)
+    return sum(len(data[i*ccarchive.COMPRESSION_STRIDE:i*ccarchive.COMPRESSION_STRIDE+ccarchive.COMPRESSION_WINDOW])
+               for i in range(ccarchive.COMPRESSION_NUM_WINDOWS)) // 4
+
+
+def stage_compute_shannon_entropy(ctx):
+    ccarchive.compute_shannon_entropy(ctx["data"])
+    return len(ctx["data"])
+
+
+def stage_calculate_mape(ctx):
+    ccarchive.calculate_mape(ctx["data"], ctx["cc_data"], "column", "date", ctx["tmpdir"], ctx["errorlist_format"])
+    return len(ctx["data"])
+
+
+STAGES = {"collect_days": stage_collect_days, "map_nearest_new": stage_map_nearest_new, "find_nearest_new": stage_find_nearest_new,
+          "embed_cc": stage_embed_cc, "create_cc_data": stage_create_cc_data, "find_nearest": stage_find_nearest,
+          "create_regular_output": stage_create_regular_output, "compute_bigrams_multi": stage_compute_bigrams_multi, "compute_bigrams": stage_compute_bigrams,
+          "compute_compressibility": stage_compute_compressibility, "compute_shannon_entropy": stage_compute_shannon_entropy, "calculate_mape": stage_calculate_mape}
+
+
+# Create synthetic data needed by the given stages (not timed)
+def prepare(num_samples, density, stages, tmpdir, scalar_limit, errorlist_format):
+    rng = np.random.default_rng(SEED)
+    data, data_as_int = synth_stream(num_samples, rng)
+    archive = synth_archive(data_as_int, density, rng)
+    ctx = {"tmpdir": tmpdir, "data": data, "data_as_int": data_as_int, "archive": archive, "scalar_limit": scalar_limit, "errorlist_format": errorlist_format,
+           "secret_bits": rng.integers(0, 2, num_samples, dtype=np.uint8), "stream_fname": os.path.join(tmpdir, "reg.bin")}
+    if "collect_days" in stages:
+        # Only needed to write sensor data files, not imported by other stages
+        import pandas as pd
+        ctx["day_fnames"] = []
+        for day, day_data in enumerate(np.array_split(data, NUM_DAYS)):
+            fname = "day{}.csv".format(day)
+            os.makedirs(os.path.join(tmpdir, collect_data.VAL_DIR), exist_ok=True)
+            pd.DataFrame({column_name: day_data for column_name in collect_data.COLUMN_NAMES}).to_csv(os.path.join(tmpdir, collect_data.VAL_DIR, fname), index=False)
+            ctx["day_fnames"].append(fname)
+    if "create_cc_data" in stages:
+        values, lower, upper = archive
+        ctx["neighbors"] = {value: [low] if low == up else [low, up] for value, low, up in zip(values.tolist(), lower.tolist(), upper.tolist())}
+    if {"compute_bigrams_multi", "compute_compressibility"} & set(stages):
+        data.astype('>f4').tofile(ctx["stream_fname"])
+    if "compute_bigrams" in stages:
+        ctx["scalar_stream_fname"] = os.path.join(tmpdir, "reg_scalar.bin")
+        data[:scalar_limit].astype('>f4').tofile(ctx["scalar_stream_fname"])
+    if "calculate_mape" in stages:
+        ctx["cc_data"], _ = ccarchive.embed_cc(data, ctx["secret_bits"], archive, NN_THRESHOLD, np.random.default_rng(SEED))
+    return ctx
+
+
+# Peak memory (kB) allocated by one untimed run of a stage (tracemalloc slows down allocations)
+def get_peak_alloc(stage, ctx):
+    tracemalloc.start()
+    try:
+        STAGES[stage](ctx)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+# Run given stages, each repeat times, report fastest run
+# peak_alloc_kb (if use_tracemalloc is set) is the peak of the stage, process_peak_rss_kb the peak of the process up to the stage
+def run_config(num_samples, density, stages, repeat, scalar_limit, errorlist_format, use_tracemalloc=False):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ctx = prepare(num_samples, density, stages, tmpdir, scalar_limit, errorlist_format)
+        results = {}
+        for stage in stages:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                start_cpu = time.process_time()
+                samples = STAGES[stage](ctx)
+                timings.append((time.perf_counter() - start, time.process_time() - start_cpu))
+            seconds, cpu_seconds = min(timings)
+            results[stage] = {"samples": samples, "sample_unit": SAMPLE_UNITS.get(stage, STREAM_VALUES), "seconds": seconds, "cpu_seconds": cpu_seconds,
+                              "samples_per_s": samples/seconds if seconds > 0 else None, "process_peak_rss_kb": get_peak_rss()}
+            if use_tracemalloc:
+                results[stage]["peak_alloc_kb"] = get_peak_alloc(stage, ctx)
+            print("{} samples, density {}: {} {:.6f} s".format(num_samples, density, stage, seconds), file=sys.stderr)
+    return {"samples": num_samples, "density": density, "stages": results}
+
+
+# Compare stage timings with baseline for matching configurations, returns list of regressions
+def compare(report, baseline, tolerance=TOLERANCE):
+    baseline_runs = {(run["samples"], run["density"]): run["stages"] for run in baseline["runs"]}
+    regressions = []
+    for run in report["runs"]:
+        baseline_stages = baseline_runs.get((run["samples"], run["density"]), {})
+        for stage, result in run["stages"].items():
+            if stage not in baseline_stages or baseline_stages[stage]["samples"] != result["samples"]:
+                continue
+            baseline_seconds = baseline_stages[stage]["seconds"]
+            result["baseline_seconds"] = baseline_seconds
+            result["speedup"] = baseline_seconds/result["seconds"] if result["seconds"] > 0 else None
+            if result["seconds"] > MIN_SECONDS and result["seconds"] > baseline_seconds*(1 + tolerance):
+                regressions.append({"samples": run["samples"], "density": run["density"], "stage": stage,
+                                    "seconds": result["seconds"], "baseline_seconds": baseline_seconds})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic sensor data streams.")
+    parser.add_argument("--samples", nargs='+', type=float, default=SAMPLES, help="numbers of samples of synthetic streams (e.g., 1e3 1e8)")
+    parser.add_argument("--densities", nargs='+', type=float, default=DENSITIES, help="fractions of value range archived")
+    parser.add_argument("--stages", nargs='+', default=list(STAGES), choices=list(STAGES), help="stages to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each stage, fastest is reported")
+    parser.add_argument("--scalar-limit", type=int, default=SCALAR_LIMIT, help="maximum number of samples processed by scalar reference implementations")
+    parser.add_argument("--errorlist-format", choices=["csv", "npy"], default=ccarchive.ERRORLIST_FORMAT, help="format of lists of relative errors")
+    parser.add_argument("--tracemalloc", action='store_true', help="also report peak memory allocated by each stage (one additional untimed run)")
+    parser.add_argument("--output", default=None, help="write report to this file")
+    parser.add_argument("--baseline", default=None, help="compare with report written before")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown compared to baseline (fraction)")
+    args = parser.parse_args()
+
+    report = {"python": sys.version.split()[0], "numpy": np.__version__, "repeat": args.repeat, "scalar_limit": args.scalar_limit, "runs": []}
+    for num_samples in args.samples:
+        for density in args.densities:
+            report["runs"].append(run_config(int(num_samples), density, args.stages, args.repeat, args.scalar_limit, args.errorlist_format, args.tracemalloc))
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as bf:
+            regressions = compare(report, json.load(bf), args.tolerance)
+        report["regressions"] = regressions
+    if args.output:
+        with open(args.output, 'w') as of:
+            json.dump(report, of, indent=2)
+    print(json.dumps(report, indent=2))
+    if regressions:
+        print("{} stage(s) slower than baseline!".format(len(regressions)), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
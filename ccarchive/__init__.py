@@ -0,0 +1,19 @@
+'''
+Archive-based covert channel: archiving phase (collect_data), covert channel of a single stream (channel), and its evaluation (evaluation).
+Submodules are imported on first use, e.g., ccarchive.channel does not import the evaluation, ccarchive.evaluate() does.
+'''
+
+import importlib
+
+# Submodules (e.g., ccarchive.channel after import ccarchive), otherwise functions and constants of the evaluation
+# (e.g., ccarchive.evaluate(), ccarchive.NUM_LAST_DIGITS), modules are imported on first access
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    try:
+        return importlib.import_module("." + name, __name__)
+    except ModuleNotFoundError as e:
+        # Missing dependencies of a submodule are not masked
+        if e.name != __name__ + "." + name:
+            raise
+    return getattr(importlib.import_module(".evaluation", __name__), name)
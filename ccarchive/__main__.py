@@ -0,0 +1,5 @@
+from .evaluation import main
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+'''
+Reads and writes archives of the archiving phase, converts csv archives to the binary format.
+'''
+
+
+import os
+import sys
+import csv
+import json
+import numpy as np
+
+
+# Binary archive: .npy file holding an int64 array of shape (3, n) with rows
+# archived values (sorted), lower nearest non-archived neighbor, upper nearest non-archived neighbor.
+# Lower and upper neighbor only differ if the archived value has two equidistant nearest neighbors.
+# Rows are contiguous, so each of them can be used directly from a memory map.
+ARCHIVE_EXT = ".npy"
+CSV_ARCHIVE_EXT = ".csv"
+
+
+# Write binary archive
+def save_archive(fname, values, lower, upper):
+    archive = np.empty((3, len(values)), dtype=np.int64)
+    archive[0] = values
+    archive[1] = lower
+    archive[2] = upper
+    np.save(fname, archive)
+
+
+# Map binary archive into memory (read-only)
+def load_archive(fname):
+    return np.load(fname, mmap_mode='r')
+
+
+# Read csv archive with rows value,"[neighbor(s)]"
+def read_csv_archive(fname):
+    dict_of_collected_data = {}
+    with open(fname, 'r') as nnf:
+        reader = csv.reader(nnf)
+        for row in reader:
+            k, v = row
+            dict_of_collected_data[int(k)] = json.loads(v)
+    return archive_from_dict(dict_of_collected_data)
+
+
+def archive_from_dict(dict_of_collected_data):
+    archive = np.empty((3, len(dict_of_collected_data)), dtype=np.int64)
+    archive[0] = list(dict_of_collected_data.keys())
+    archive[1] = [v[0] for v in dict_of_collected_data.values()]
+    archive[2] = [v[-1] for v in dict_of_collected_data.values()]
+    return archive
+
+
+# Map each archived value to its nearest non-archived neighbor(s), as in csv archives
+def archive_to_dict(archive):
+    return {value: [lower] if lower == upper else [lower, upper] for value, lower, upper in np.asarray(archive).T.tolist()}
+
+
+# Load archive in either format, chosen by file extension
+def read_archive(fname):
+    if os.path.splitext(fname)[1] == ARCHIVE_EXT:
+        return load_archive(fname)
+    return read_csv_archive(fname)
+
+
+# Return path of binary archive if present, otherwise path of csv archive (base name without extension)
+def find_archive(basename):
+    if os.path.exists(basename + ARCHIVE_EXT):
+        return basename + ARCHIVE_EXT
+    return basename + CSV_ARCHIVE_EXT
+
+
+# Convert csv archive to binary archive next to it
+def convert(csv_fname):
+    archive = read_csv_archive(csv_fname)
+    npy_fname = os.path.splitext(csv_fname)[0] + ARCHIVE_EXT
+    save_archive(npy_fname, *archive)
+    return npy_fname
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Please specify csv archive(s) to convert!")
+        sys.exit(1)
+    for fname in sys.argv[1:]:
+        print("Converted {} to {}".format(fname, convert(fname)))
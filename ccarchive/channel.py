@@ -0,0 +1,193 @@
+'''
+Covert channel of a single stream: sensor data stream files, nearest neighbors, embedding of secret message bits.
+Depends on numpy and the standard library only, so the sender (implementation/client.py) and other tools import it with low startup overhead.
+'''
+
+
+import bisect
+import random
+import zlib
+import numpy as np
+
+
+# Toggle deterministic or probabilistic behavior in case of multiple nearest neighbors
+RANDOM_NEIGHBORS = True
+# Base seed, each grid cell derives its own seed from it (see get_cell_seed())
+RANDOM_SEED = 1337
+# Write sensor data stream files as memory-mapped arrays, bigrams and compressibility are computed from the mapped pages
+MMAP_STREAMS = False
+# Largest value (scaled to integer) of feasible interval of nearest values not in archive
+MAXVAL = 10**8 - 1
+
+
+# Create binary file with stream of sensor data values (big-endian float32), returns stream as array
+# If mmap is set, the returned array is mapped to the file instead of held in memory, MMAP_STREAMS applies if mmap is None
+def create_regular_output(input_data, output_fname, mmap=None):
+    if mmap is None:
+        mmap = MMAP_STREAMS
+    if mmap and len(input_data):
+        stream = np.memmap(output_fname, dtype='>f4', mode='w+', shape=(len(input_data),))
+        stream[:] = input_data
+        stream.flush()
+        return stream
+    stream = np.asarray(input_data, dtype=np.float64).astype('>f4')
+    stream.tofile(output_fname)
+    return stream
+
+
+# Covert channel simulation, creates output stream with embedded cc
+"""
+check if next bit of secret msg is 0 or 1 
+if 0, check if next value in input_data is also in collect_seven_days, if so, do nothing (means 0 for cr), 
+if value is not in collection, change value to next value with min_dist, which IS in collection (also means 0 for cr). 
+if next bit of secret msg is 1, do nothing if next value of input_data is not in collection, change to nearest value, which IS in collection (both means 1 for cr)
+"""
+def create_cc_data(input_data, output_fname, secret_msg_gen, dict_of_collected_data, threshold):
+    # Create cc data stream
+    cc_data = []
+    colldata = list(dict_of_collected_data.keys())
+    values_used = 0
+    for datum in input_data:
+        datum_as_int = round(datum*10000)
+        # Determine closest value
+        if datum_as_int in dict_of_collected_data:
+            if RANDOM_NEIGHBORS:
+                # If there are two closest values, choose randomly
+                nearest_as_int = random.choice(dict_of_collected_data[datum_as_int])
+            else:
+                # Deterministically choose upper neighbor
+                nearest_as_int = dict_of_collected_data[datum_as_int][-1]
+        else:
+            nearest_as_int = find_nearest(datum_as_int, colldata)
+        nearest = nearest_as_int / 10000
+        if abs(datum_as_int - nearest_as_int) > threshold:
+            # Skip value
+            cc_data.append(datum)
+            continue
+        values_used += 1
+        # Transmit secret message bit
+        next_secret_bit = next(secret_msg_gen) 
+        if next_secret_bit == 0:
+            if datum_as_int in dict_of_collected_data:
+                cc_data.append(datum)
+            else:
+                cc_data.append(nearest)
+        else:    
+            # Secret bit is 1
+            if datum_as_int in dict_of_collected_data:
+                cc_data.append(nearest)
+            else:
+                cc_data.append(datum)
+
+    return create_regular_output(cc_data, output_fname), values_used
+
+
+# Nearest neighbors of each datum independent of the threshold, shared by embed_cc() for all thresholds
+# Ties are resolved deterministically (upper neighbor), random choices are applied by embed_cc()
+def find_neighbors(input_data, archive):
+    data = np.asarray(input_data, dtype=np.float64)
+    data_as_int = np.rint(data*10000).astype(np.int64)
+    values, lower, upper = archive
+    # Position of each datum in archive
+    ind = np.searchsorted(values, data_as_int)
+    ind_in = np.minimum(ind, len(values)-1)
+    in_archive = values[ind_in] == data_as_int
+
+    # Closest archived value for data not in archive, see find_nearest()
+    below = values[np.clip(ind-1, 0, len(values)-1)]
+    above = values[ind_in]
+    dist_below = data_as_int - below
+    dist_above = above - data_as_int
+    nearest_as_int = np.where(dist_below < dist_above, below, above)
+    clamped = (data_as_int >= values[-1]) | (data_as_int <= values[0])
+    nearest_as_int = np.where(data_as_int >= values[-1], values[-1], nearest_as_int)
+    nearest_as_int = np.where(data_as_int <= values[0], values[0], nearest_as_int)
+
+    # Closest value not in archive for archived data, deterministically upper neighbor
+    nearest_as_int = np.where(in_archive, upper[ind_in], nearest_as_int)
+    # Distance to nearest neighbor is the same for either of two equidistant neighbors
+    return {"data": data, "data_as_int": data_as_int, "in_archive": in_archive, "nearest": nearest_as_int, "distance": np.abs(data_as_int - nearest_as_int),
+            "tie": (dist_below == dist_above) & ~clamped & ~in_archive, "below": below, "lower": lower[ind_in]}
+
+
+# Vectorized covert channel simulation, processes whole input column at once
+# Output is identical to create_cc_data() if RANDOM_NEIGHBORS is False, otherwise ties are broken using rng
+# Nearest neighbors are searched unless given (see find_neighbors()), results do not depend on whether they are given
+def embed_cc(input_data, secret_bits, archive, threshold, rng=None, neighbors=None):
+    if neighbors is None:
+        neighbors = find_neighbors(input_data, archive)
+    data = neighbors["data"]
+    in_archive = neighbors["in_archive"]
+    nearest_as_int = neighbors["nearest"]
+    if RANDOM_NEIGHBORS:
+        # If there are two closest values, choose randomly
+        nearest_as_int = np.where(neighbors["tie"] & (rng.integers(0, 2, len(data)) == 1), neighbors["below"], nearest_as_int)
+        nearest_as_int = np.where(in_archive & (rng.integers(0, 2, len(data)) == 1), neighbors["lower"], nearest_as_int)
+
+    # Skip values too far from their nearest neighbor, each remaining value transmits one secret message bit
+    used = neighbors["distance"] <= threshold
+    values_used = int(np.count_nonzero(used))
+    if values_used > len(secret_bits):
+        raise ValueError("Secret message too short for {} values!".format(values_used))
+    bits = np.zeros(len(data), dtype=np.uint8)
+    bits[used] = secret_bits[:values_used]
+    # Bit 0 is encoded by archived values, bit 1 by values not in archive
+    change = used & (bits == in_archive)
+    cc_data = np.where(change, nearest_as_int / 10000, data)
+    return cc_data, values_used
+
+
+# Determine closest value in given (ordered) list of collected data for input datum
+def find_nearest(datum, data):
+    if datum >= data[-1]:
+        return data[-1]
+    if datum <= data[0]:
+        return data[0]
+    # Determine position for datum in given (ordered) list
+    ind = bisect.bisect_left(data,datum)
+    # If distance to both neighbors is equal, choose randomly if random choice is specified (see above)
+    if data[ind] - datum == datum - data[ind-1] and RANDOM_NEIGHBORS:
+        return random.choice([data[ind], data[ind-1]])
+    # Deterministically always choose upper neighbor in case of equidistanced neighbors
+    if datum - data[ind-1] < data[ind] - datum:
+        return data[ind-1]
+    return data[ind]
+
+
+# Vectorized implementation, cost depends on number of archived values instead of their range
+# Returns lower and upper nearest neighbor for each value of sorted unique data, both are equal unless distances are equal
+def map_nearest_new(data):
+    data = np.asarray(data, dtype=np.int64)
+    # Values in a run of consecutive integers share their nearest gaps
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(data) != 1) + 1))
+    run_lengths = np.diff(np.append(starts, len(data)))
+    lower = np.repeat(data[starts] - 1, run_lengths)
+    upper = np.repeat(data[starts + run_lengths - 1] + 1, run_lengths)
+    if np.any((lower < 0) & (upper > MAXVAL)):
+        raise ValueError("No nearest value found in feasible interval!")
+    choose_lower = (data - lower < upper - data) | (upper > MAXVAL)
+    choose_upper = ~choose_lower & ((data - lower > upper - data) | (lower < 0))
+    return np.where(choose_upper, upper, lower), np.where(choose_lower, lower, upper)
+
+
+# Read secret message to be transmitted
+def read_secret_message(filename):
+    with open(filename, 'rb') as smf:
+        return smf.read()
+
+
+# Each call of next() yields 1 bit of secret message
+def get_secret_message_bit_gen(msg):
+    for byte in msg:
+        for i in reversed(range(8)):
+            yield (byte>>i)&1
+
+
+# Array of all bits of secret message, in the same order as yielded by get_secret_message_bit_gen()
+def get_secret_message_bits(msg):
+    return np.unpackbits(np.frombuffer(msg, dtype=np.uint8))
+
+
+# Derive seed for one grid cell from its parameters, independent of the order in which cells are evaluated
+def get_cell_seed(period, nn_threshold, data_filename, column_header):
+    return zlib.crc32("{},{},{},{},{}".format(RANDOM_SEED, period, nn_threshold, data_filename, column_header).encode())
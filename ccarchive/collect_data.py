@@ -0,0 +1,246 @@
+'''
+Simulates archiving phase of the archive-based covert channel
+Usage: python -m ccarchive.collect_data <output path> [--columns ...] (or console script ccarchive-collect)
+'''
+
+
+import csv
+import numpy as np
+import os
+import sys
+import json
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from . import archivefile
+from . import sensorfile
+from . import instrument
+from .channel import MAXVAL, map_nearest_new
+
+
+# Log file name, located in output path
+LOGFILE = "nearest_neighbors.log"
+# Path to input data
+VAL_DIR = "./sensor_data/"
+# State of incremental archive builders, reused by later runs
+ARCHIVE_CACHE_DIR = "./archive_cache/"
+# Columns (headers or glob patterns, e.g. "R*") archived by default
+COLUMN_NAMES = ["Flow rate (mL/min)", "R1 (MOhm)"]
+# Formats of archive files written, see archivefile.py for binary format
+ARCHIVE_FORMATS = ["csv", "npy"]
+
+
+# Identify sensor data file by name, size and modification time
+def get_file_id(name):
+    st = os.stat(os.path.join(VAL_DIR, name))
+    return [name, st.st_size, st.st_mtime_ns]
+
+
+# Collects sensor data of consecutive files (i.e., days) incrementally, keeps sorted unique values for each column
+# Snapshots of the collected values are kept for each requested number of files, so shorter periods are served
+# from the same state and longer periods only ingest additional files
+class ArchiveBuilder:
+    def __init__(self, column_names):
+        self.column_names = column_names
+        self.reset()
+
+    def reset(self):
+        self.file_ids = []
+        self.values = [np.empty(0, dtype=np.int64) for _ in self.column_names]
+        self.snapshots = {}
+
+    # Add values of one sensor data file
+    def ingest(self, name):
+        with instrument.tracer.stage("ingest", file=name) as counters:
+            data = sensorfile.load_columns(os.path.join(VAL_DIR, name), self.column_names)
+            for i in range(len(self.column_names)):
+                val = np.rint(data[self.column_names[i]]*10000).astype(np.int64)
+                self.values[i] = np.union1d(self.values[i], val)
+            counters["items"] = sum(len(data[column_name]) for column_name in self.column_names)
+        self.file_ids.append(get_file_id(name))
+
+    # Return sorted unique values for each column collected from given files
+    def collect(self, file_names):
+        ingested = [file_id[0] for file_id in self.file_ids]
+        if file_names[:len(ingested)] != ingested[:len(file_names)] or [get_file_id(name) for name in ingested[:len(file_names)]] != self.file_ids[:len(file_names)]:
+            # Different or modified files
+            self.reset()
+        elif len(file_names) not in self.snapshots and len(file_names) < len(self.file_ids):
+            # Shorter period without snapshot
+            self.reset()
+        if len(file_names) not in self.snapshots:
+            for name in file_names[len(self.file_ids):]:
+                self.ingest(name)
+            self.snapshots[len(file_names)] = list(self.values)
+        return self.snapshots[len(file_names)]
+
+    # State of each column is saved to its own file, so builders of other selections of columns reuse it, returns names of files written
+    def save(self, first_file_name):
+        fnames = []
+        for i, column_name in enumerate(self.column_names):
+            arrays = {"snapshot_{}".format(num_files): snapshot[i] for num_files, snapshot in self.snapshots.items()}
+            state = {"column_name": column_name, "file_ids": self.file_ids, "snapshots": list(self.snapshots)}
+            fnames.append(get_builder_fname(first_file_name, column_name))
+            np.savez(fnames[-1], state=json.dumps(state), values=self.values[i], **arrays)
+        return fnames
+
+    # Load states of the given columns written by save(), returns empty builder unless all columns were collected from the same files
+    @classmethod
+    def load(cls, first_file_name, column_names):
+        builder = cls(column_names)
+        states = []
+        for column_name in column_names:
+            fname = get_builder_fname(first_file_name, column_name)
+            if not os.path.exists(fname):
+                return builder
+            with np.load(fname) as saved:
+                state = json.loads(str(saved["state"]))
+                if state["column_name"] != column_name or (states and state["file_ids"] != states[0][0]["file_ids"]):
+                    return builder
+                states.append((state, saved["values"], {num_files: saved["snapshot_{}".format(num_files)] for num_files in state["snapshots"]}))
+        builder.file_ids = states[0][0]["file_ids"]
+        builder.values = [values for _, values, _ in states]
+        # Snapshots available for all columns
+        num_files = set.intersection(*(set(snapshots) for _, _, snapshots in states))
+        builder.snapshots = {n: [snapshots[n] for _, _, snapshots in states] for n in sorted(num_files)}
+        return builder
+
+
+# Path of persisted state of one column of the builder for periods starting with given file
+def get_builder_fname(first_file_name, column_name):
+    return os.path.join(ARCHIVE_CACHE_DIR, "{}_{}.npz".format(os.path.splitext(first_file_name)[0], sensorfile.get_column_fname(column_name)))
+
+
+# Collect sensor data from specified files and columns, return sorted (unique) values for each column (i.e., sensor)
+def collect_days(file_names, column_names=COLUMN_NAMES):
+    return ArchiveBuilder(column_names).collect(file_names)
+
+
+# Return value closest to given datum that is NOT in collected data
+def find_nearest_new(datum, data):
+    nearest_new = 0
+    dist=1
+    while (datum+dist <= data[-1] and datum-dist >= data[0]):
+        if datum + dist not in data:
+            nearest_new = datum + dist
+            break
+        elif datum - dist not in data:
+            nearest_new = datum - dist
+            break
+        dist += 1
+    if datum+dist > data[-1]:
+        nearest_new = data[-1]+1
+    if datum-dist < data[0]:
+        nearest_new = data[0]-1
+    return nearest_new
+
+
+# Alternative implementation mitigating execution speed issues
+def find_nearest_new(datum, gapgen, lower, upper):
+    while datum > upper:
+        lower = upper
+        upper = next(gapgen)
+    if lower < 0 and upper > MAXVAL:
+        raise ValueError("No nearest value found in feasible interval!")
+    if datum - lower < upper - datum or upper > MAXVAL:
+        return [lower], lower, upper
+    if datum - lower > upper - datum or lower < 0:
+        return [upper], lower, upper
+    # Both neighbors are within feasible interval and distances are equal
+    return [lower, upper], lower, upper
+
+
+# Map collected values of one column to their nearest neighbors and write archive files
+def write_archive(outpath, period, column_name, data):
+    tracer = instrument.tracer
+    with tracer.cell(phase="map", period=period, column=column_name):
+        logging.info('Searching nearest neighbors to collected values in column {}...'.format(column_name))
+        # Use vectorized implementation
+        with tracer.stage("map_nearest_new", items=len(data)):
+            nearest_lower, nearest_upper = map_nearest_new(data)
+            list_of_nearest = [[lower] if lower == upper else [lower, upper] for lower, upper in zip(nearest_lower.tolist(), nearest_upper.tolist())]
+        logging.info('Found all {} neighbors!'.format(len(list_of_nearest)))
+
+        logging.info('Writing to file ...')
+        basename = os.path.join(outpath, "values_with_nearest_neighbors_{}_days_{}".format(period, sensorfile.get_column_fname(column_name)))
+        if "csv" in ARCHIVE_FORMATS:
+            with tracer.stage("write_csv_archive", items=len(data)-1) as counters:
+                with open(basename + ".csv", 'w', newline='') as csvfile:
+                    fieldnames = ['value', 'nearest']
+                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                    values = data.tolist()
+                    for item in range(len(values)-1):
+                        writer.writerow({'value': values[item], 'nearest': list_of_nearest[item]})
+                counters["bytes_written"] = instrument.file_size(basename + ".csv")
+        if "npy" in ARCHIVE_FORMATS:
+            # Same values as csv archive
+            with tracer.stage("write_npy_archive", items=len(data)-1) as counters:
+                archivefile.save_archive(basename + archivefile.ARCHIVE_EXT, data[:-1], nearest_lower[:-1], nearest_upper[:-1])
+                counters["bytes_written"] = instrument.file_size(basename + archivefile.ARCHIVE_EXT)
+        logging.info('Finished!')
+
+
+def main():
+    ################################################################
+    # Preparations
+    ################################################################
+    parser = argparse.ArgumentParser(description="Simulate archiving phase of archive-based covert channel.")
+    parser.add_argument("outpath", help="output path of archives")
+    parser.add_argument("--columns", nargs='+', default=COLUMN_NAMES, help="column headers or glob patterns (e.g., 'R*') of columns to archive")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes mapping and writing archives of columns (default: number of CPUs, 1: run in this process)")
+    args = parser.parse_args()
+
+    outpath = args.outpath
+    if not os.path.exists(outpath):
+        os.makedirs(outpath)
+    logging.basicConfig(filename=os.path.join(outpath, LOGFILE), encoding='utf-8', level=logging.DEBUG)
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+
+    file_names = ["20160930_203718_tenthpermill.csv", "20160930_203718_permill.csv", "20160930_203718_percent.csv", "20160930_203718_tenth.csv", "20160930_203718.csv", "20161001_231809.csv", "20161003_085624.csv", "20161004_104124.csv", "20161005_140846.csv", "20161006_182224.csv", "20161007_210049.csv", "20161008_234508.csv", "20161010_095046.csv", "20161011_113032.csv"]
+    periods=[0.0001, 0.001, 0.01, 0.1, 1, 10]
+    # Columns of all files are selected by headers of the first file
+    column_names = sensorfile.select_columns(os.path.join(VAL_DIR, file_names[0]), args.columns)
+    if not os.path.exists(ARCHIVE_CACHE_DIR):
+        os.makedirs(ARCHIVE_CACHE_DIR)
+    ################################################################
+
+    # Stages are traced if instrumentation is enabled (see instrument.py)
+    tracer = instrument.tracer
+
+    # Collect data, periods starting with the same file share one incremental builder
+    # All columns of a file are read in one pass
+    builders = {}
+    transmitted_values_lists = [None] * len(periods)
+    for i in range(len(periods)):
+        logging.info("Collecting {} days of data from columns {}...".format(periods[i], column_names))
+        if periods[i] <= 1:
+            period_file_names = [file_names[i]]
+        else:
+            period_file_names = file_names[periods.index(1):periods.index(1)+periods[i]]
+        with tracer.cell(phase="collect", period=periods[i]):
+            if period_file_names[0] not in builders:
+                with tracer.stage("load_builder"):
+                    builders[period_file_names[0]] = ArchiveBuilder.load(period_file_names[0], column_names)
+            with tracer.stage("collect_days", files=len(period_file_names)) as counters:
+                transmitted_values_lists[i] = builders[period_file_names[0]].collect(period_file_names)
+                counters["items"] = sum(len(values) for values in transmitted_values_lists[i])
+        for j in range(len(transmitted_values_lists[i])):
+            logging.info("Collected {} unique values for column {}".format(len(transmitted_values_lists[i][j]), column_names[j]))
+    for first_file_name, builder in builders.items():
+        with tracer.stage("save_builder") as counters:
+            fnames = builder.save(first_file_name)
+            counters["bytes_written"] = sum(instrument.file_size(fname) for fname in fnames)
+
+    # Determine closest values, archives of all periods and columns are independent
+    archives = [(outpath, periods[i], column_names[j], transmitted_values_lists[i][j]) for i in range(len(periods)) for j in range(len(column_names))]
+    if args.workers == 1:
+        for archive in archives:
+            write_archive(*archive)
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for future in [executor.submit(write_archive, *archive) for archive in archives]:
+                future.result()
+
+
+if __name__ == "__main__":
+    main()
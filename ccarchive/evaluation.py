@@ -0,0 +1,511 @@
+'''
+Evaluates archive-based covert channel.
+Usage: python -m ccarchive <sensor data file> <column header(s)> <results directory> [<threshold>...] (or console script ccarchive)
+Stream writing and embedding are located in ccarchive.channel.
+'''
+
+
+import sys
+import os
+import numpy as np
+import math
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import zlib
+import lzma
+import bz2
+from . import archivefile
+from . import sensorfile
+from . import instrument
+from .channel import create_regular_output, find_neighbors, embed_cc, read_secret_message, get_secret_message_bits, get_cell_seed
+
+
+SECRET_MESSAGE_FNAME = "./pseudos.bin.gpg"
+# Number of last digits for bigram computation
+NUM_LAST_DIGITS = [4, 2, 1]
+# Compressibility is computed for windows of given size (bytes) at offsets increased by given stride (bytes)
+COMPRESSION_WINDOW = 4096
+COMPRESSION_STRIDE = 40
+COMPRESSION_NUM_WINDOWS = 100
+# Codecs used for compressibility, see COMPRESSORS
+COMPRESSION_CODECS = ["gzip"]
+# Format of lists of relative errors, "csv" or "npy"
+ERRORLIST_FORMAT = "csv"
+# Parameters for results plots
+COMPRESSIBILITY_Y_AXIS_RANGE = 0.75
+BIGRAMS_X_AXIS_NUM_TICKS = 5
+
+
+# Calculate mean absolute percentage error (MAPE) and maximum relative error, write list of relative errors
+def calculate_mape(list1, list2, column_fname, date, errorpath, errorlist_format=ERRORLIST_FORMAT):
+    rel_err = compute_relative_errors(list1, list2)
+    # Write to file
+    write_errorlist(rel_err, os.path.join(errorpath, date + '_' + column_fname), errorlist_format)
+    return summarize_relative_errors(rel_err)
+
+
+# Relative errors of modified values
+def compute_relative_errors(list1, list2):
+    original = np.asarray(list1, dtype=np.float64)
+    modified = np.asarray(list2, dtype=np.float64)
+    # Exclude initialization phase where values could be 0
+    nonzero = np.abs(original) > 0
+    return np.abs(original[nonzero] - modified[nonzero]) / np.abs(original[nonzero])
+
+
+# MAPE and maximum relative error
+def summarize_relative_errors(rel_err):
+    # Builtin sum keeps MAPE identical to summing up the list of relative errors
+    mape = 100 * (sum(rel_err.tolist()) / len(rel_err))
+    return mape, float(rel_err.max())
+
+
+# Write relative errors to csv file (one per line) or npy file, fname without extension
+def write_errorlist(rel_err, fname, errorlist_format=ERRORLIST_FORMAT):
+    if errorlist_format == "npy":
+        np.save(fname + ".npy", rel_err)
+        return
+    with open(fname + ".csv", 'w') as temp_file:
+        temp_file.write("".join("%s\n" % item for item in rel_err.tolist()))
+
+
+# Compute absolute frequencies of bigrams in data stream
+def compute_bigrams(stream_fname, value_range):
+    values = []
+    with open(stream_fname, "rb") as sf:
+        bytes_read = sf.read(4)
+        while bytes_read:
+            values.append(int.from_bytes(bytes_read, "big"))
+            bytes_read = sf.read(4)
+    bigram_occurences = {}
+    for i in range(len(values)-1):
+        current_key = (values[i]%value_range, values[i+1]%value_range)
+        if current_key in bigram_occurences:
+            bigram_occurences[current_key] += 1
+        else:
+            bigram_occurences[current_key] = 1
+    absolute_occurences = sorted(list(bigram_occurences.values()), reverse=True)
+    return absolute_occurences, bigram_occurences
+
+
+# Compute absolute frequencies of bigrams in data stream for several numbers of last bits (value range 2**num_bits) at once
+# Stream (file name or array returned by create_regular_output()) is read once, returns same results as compute_bigrams() for each number of last bits
+def compute_bigrams_multi(stream, num_last_digits):
+    if isinstance(stream, str):
+        values = np.fromfile(stream, dtype='>u4').astype(np.int64)
+    else:
+        values = np.asarray(stream).view('>u4').astype(np.int64)
+    results = []
+    for num_bits in num_last_digits:
+        last_bits = values & (2**num_bits - 1)
+        codes = (last_bits[:-1] << num_bits) | last_bits[1:]
+        counts = np.bincount(codes, minlength=4**num_bits)
+        # Order bigrams by first occurrence in stream, like compute_bigrams()
+        occurring_codes, first_occurences = np.unique(codes, return_index=True)
+        occurring_codes = occurring_codes[np.argsort(first_occurences)].tolist()
+        bigram_occurences = {(code >> num_bits, code & (2**num_bits - 1)): int(counts[code]) for code in occurring_codes}
+        absolute_occurences = sorted(list(bigram_occurences.values()), reverse=True)
+        results.append((absolute_occurences, bigram_occurences))
+    return results
+
+
+# Write occurences of bigrams to csv file, most frequent first
+def write_bigrams(bigram_occurences, fname):
+    # Imported on first use, loading pandas dominates startup time otherwise
+    import pandas as pd
+    bgdf = pd.DataFrame.from_dict(bigram_occurences, orient='index').reset_index()
+    bgdf.columns = ["bigram", "occurences"]
+    bgdf = bgdf.sort_values("occurences", ascending=False)
+    bgdf.to_csv(fname, index=False)
+
+
+# Compress data with gzip framing (as written by gzip module), level 9
+def compress_gzip(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+COMPRESSORS = {"gzip": compress_gzip, "lzma": lzma.compress, "bz2": bz2.compress}
+
+
+# Compute compressibility (window size / compressed size) of windows of a data stream held in memory
+def compute_compressibility(data, codec="gzip", window=COMPRESSION_WINDOW, stride=COMPRESSION_STRIDE, num_windows=COMPRESSION_NUM_WINDOWS):
+    compress = COMPRESSORS[codec]
+    data = memoryview(data)
+    cprs = []
+    for i in range(num_windows):
+        cprs.append(window/len(compress(data[i*stride:i*stride+window])))
+    return cprs
+
+
+# Write compressibilities of each window for all codecs to csv file
+def write_compressibilities(compressibilities, fname, stride=COMPRESSION_STRIDE):
+    codecs = list(compressibilities)
+    with open(fname, 'w') as cf:
+        cf.write("offset,{}\n".format(",".join(codecs)))
+        for i in range(len(compressibilities[codecs[0]])):
+            cf.write("{},{}\n".format(i*stride, ",".join(str(compressibilities[codec][i]) for codec in codecs)))
+
+
+# Map values to integer symbols: sensor values are scaled to integers (4 decimal places), integer values
+# (e.g., raw stream read as '>u4') are used as they are
+def get_symbols(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        return values.astype(np.int64)
+    return np.rint(values*10000).astype(np.int64)
+
+
+# Shannon entropy (bits) of distribution given by absolute frequencies
+def entropy_of_counts(counts):
+    # Most frequent first, matches summation order of former pandas value_counts() based computation
+    counts = np.sort(counts)[::-1]
+    p = counts / counts.sum()
+    # Adding 0.0 turns -0.0 of a constant stream into 0.0, as written by the former computation
+    return float(-(p*np.log(p)).sum() / np.log(2) + 0.0)
+
+
+# Compute Shannon Entropy 
+def compute_shannon_entropy(values):
+    _, counts = np.unique(get_symbols(values), return_counts=True)
+    return entropy_of_counts(counts)
+
+
+# Shannon entropy of the last window symbols, updated in O(1) per symbol
+class SlidingEntropy:
+    def __init__(self, window):
+        self.window = window
+        self.symbols = deque()
+        self.counts = {}
+        # Sum of c*log2(c) over counts c of all symbols in window
+        self.sum_clogc = 0.0
+        self.updates = 0
+
+    @staticmethod
+    def clogc(c):
+        return c*math.log2(c) if c > 1 else 0.0
+
+    def add(self, symbol):
+        c = self.counts.get(symbol, 0)
+        self.counts[symbol] = c + 1
+        self.sum_clogc += self.clogc(c + 1) - self.clogc(c)
+        self.symbols.append(symbol)
+        if len(self.symbols) > self.window:
+            old = self.symbols.popleft()
+            c = self.counts[old]
+            if c == 1:
+                del self.counts[old]
+            else:
+                self.counts[old] = c - 1
+            self.sum_clogc += self.clogc(c - 1) - self.clogc(c)
+        # Recompute sum once per window to avoid accumulating rounding errors
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self.sum_clogc = math.fsum(self.clogc(c) for c in self.counts.values())
+
+    def entropy(self):
+        n = len(self.symbols)
+        return max(math.log2(n) - self.sum_clogc/n, 0.0) if n else 0.0
+
+
+# Shannon entropy over time: entropy of each window of given size, computed every step values
+# Returns end positions (exclusive) and entropies of the windows
+# Non-overlapping windows (block entropy, step == window) are computed at once, otherwise windows slide in a single pass
+def compute_windowed_entropy(values, window, step=None):
+    symbols = get_symbols(values)
+    step = step or window
+    if step == window:
+        return compute_block_entropy(symbols, window)
+    ends = []
+    entropies = []
+    sliding = SlidingEntropy(window)
+    for i, symbol in enumerate(symbols.tolist()):
+        sliding.add(symbol)
+        if i + 1 >= window and (i + 1 - window) % step == 0:
+            ends.append(i + 1)
+            entropies.append(sliding.entropy())
+    return np.array(ends, dtype=np.int64), np.array(entropies)
+
+
+# Shannon entropy of consecutive blocks of given size (incomplete last block is omitted)
+def compute_block_entropy(values, block_size):
+    symbols = get_symbols(values)
+    num_blocks = len(symbols) // block_size
+    if num_blocks == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    unique_symbols, codes = np.unique(symbols[:num_blocks*block_size], return_inverse=True)
+    blocks = np.arange(num_blocks*block_size) // block_size
+    # Count each symbol per block
+    pairs, counts = np.unique(blocks*len(unique_symbols) + codes.ravel(), return_counts=True)
+    pair_blocks = pairs // len(unique_symbols)
+    sum_clogc = np.bincount(pair_blocks, weights=counts*np.log2(counts), minlength=num_blocks)
+    entropies = np.maximum(np.log2(block_size) - sum_clogc/block_size, 0.0)
+    return (np.arange(num_blocks, dtype=np.int64) + 1) * block_size, entropies
+
+
+# Write entropies over time of regular and cc stream to csv file
+def write_windowed_entropies(ends, entropies_reg, entropies_cc, fname):
+    with open(fname, 'w') as ef:
+        ef.write("end,entropy regular,entropy cc\n")
+        ef.write("".join("{},{},{}\n".format(end, reg, cc) for end, reg, cc in zip(ends.tolist(), entropies_reg.tolist(), entropies_cc.tolist())))
+
+
+# Path of the archive of the archiving phase for given period directory and column, binary archive is preferred
+def get_archive_fname(period_path, column_fname):
+    return archivefile.find_archive(os.path.join(period_path, 'values_with_nearest_neighbors_{}'.format(column_fname)))
+
+
+# Convert column header to a string usable in file names
+def get_column_fname(column_header):
+    return column_header.replace(" ", "_").replace("/", "-")
+
+
+# Read given columns of csv file with sensor values (cached, see sensorfile.py), return values of each given column
+# Columns are read-only arrays mapped to the cached files, so all processes share their pages (convert with tolist() for scalar create_cc_data())
+def load_sensor_data(filename, column_headers):
+    return sensorfile.load_columns(filename, column_headers)
+
+
+# Obtain top-level results directory, period, and threshold from path of results directory (<subdir>/.../<period>/<threshold>)
+def parse_result_path(respath):
+    folders = respath.split('/')
+    subdir = folders[0]
+    if folders[-1]:
+        nn_threshold = int(folders[-1])
+        period = folders[-2]
+    else:
+        nn_threshold = int(folders[-2])
+        period = folders[-3]
+    return subdir, period, nn_threshold
+
+
+def prepare_result_dirs(respath):
+    for path in [respath, os.path.join(respath, "bigrams"), os.path.join(respath, "compressibilities"), os.path.join(respath, "errorlists")]:
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+
+# Appends summary rows to csv files, header is written to new files
+class ResultWriter:
+    def __init__(self):
+        self.files = {}
+
+    def write(self, rows):
+        for fname, header, line in rows:
+            if fname not in self.files:
+                self.files[fname] = open(fname, 'a')
+                if self.files[fname].tell() == 0:
+                    self.files[fname].write(header)
+            self.files[fname].write(line)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Summary rows (file name, header, line) of a grid cell for its results directory (respath) and the top-level results directory (subdir)
+def get_summary_rows(respath, subdir, date, column_fname, period, nn_threshold, values_used, total_no_values, mape, max_err, entropy_reg, entropy_cc):
+    coverage = values_used/total_no_values
+    errorpath = os.path.join(respath, "errorlists")
+    return [(os.path.join(respath, "bandwidths.csv"), "date,column,bits_transmitted,total_no_values,coverage\n",
+             "{},{},{},{},{}\n".format(date, column_fname, values_used, total_no_values, coverage)),
+            (os.path.join(subdir, "bandwidths.csv"), "date,column,period,threshold,bits_transmitted,total_no_values,coverage\n",
+             "{},{},{},{},{},{},{}\n".format(date, column_fname, period, nn_threshold, values_used, total_no_values, coverage)),
+            (os.path.join(errorpath, "mape.csv"), "date,column,mape,max. error (%)\n",
+             "{},{},{},{}\n".format(date, column_fname, mape, max_err)),
+            (os.path.join(subdir, "mape.csv"), "date,column,period,threshold,mape,max. error (%)\n",
+             "{},{},{},{},{},{}\n".format(date, column_fname, period, nn_threshold, mape, max_err)),
+            (os.path.join(respath, "entropies.csv"), "quantity,date,entropy regular,entropy cc\n",
+             "{},{},{},{}\n".format(column_fname, date, entropy_reg, entropy_cc)),
+            (os.path.join(subdir, "entropies.csv"), "quantity,date,period,threshold,entropy regular,entropy cc\n",
+             "{},{},{},{},{},{}\n".format(column_fname, date, period, nn_threshold, entropy_reg, entropy_cc))]
+
+
+# Evaluate covert channel for one column of one sensor data file
+# Per-cell files are written to respath, returns summary rows (file name, header, line) for respath and subdir
+# Optionally, entropies over time are computed for windows of size entropy_window every entropy_step values
+# Stages are traced if instrumentation is enabled (see instrument.py)
+# If outputs is given, paths of all per-cell files written are appended to it
+# If record is given, it is filled with all results of the cell (see resultstore.py), per-cell csv files are skipped if csv_files is False
+# Nearest neighbors found by find_neighbors() can be shared by cells differing in threshold only
+# Stream files are memory-mapped if mmap_streams is set (see create_regular_output(), default: channel.MMAP_STREAMS)
+def evaluate(input_data, data_filename, column_header, respath, archive, secret_bits, subdir, period, nn_threshold, codecs=COMPRESSION_CODECS, errorlist_format=ERRORLIST_FORMAT,
+             entropy_window=None, entropy_step=None, outputs=None, record=None, csv_files=True, neighbors=None, mmap_streams=None):
+    tracer = instrument.tracer
+    rng = np.random.default_rng(get_cell_seed(period, nn_threshold, data_filename, column_header))
+    prepare_result_dirs(respath)
+    files = []
+
+    column_fname = get_column_fname(column_header)
+    date = data_filename.split('_')[0]
+    regular_output_fname = "{}_{}_sensorreg.bin".format(column_fname, date)
+    cc_output_fname = "{}_{}_sensorcc.bin".format(column_fname, date)
+    files += [os.path.join(respath, regular_output_fname), os.path.join(respath, cc_output_fname)]
+
+    print("Processing column {} in {}, period length {}, threshold {}...".format(column_header, data_filename, period, nn_threshold))
+
+    # Create regular output
+    print("Creating sensor data stream file...")
+    with tracer.stage("write_regular_stream", items=len(input_data), bytes_written=4*len(input_data)):
+        regular_stream = create_regular_output(input_data, os.path.join(respath, regular_output_fname), mmap_streams)
+
+    print("Establishing covert channel...")
+    # Create output with embedded cc
+    with tracer.stage("embed_cc", items=len(input_data)) as counters:
+        cc_data, values_used = embed_cc(input_data, secret_bits, archive, nn_threshold, rng, neighbors)
+        counters["bits"] = values_used
+    with tracer.stage("write_cc_stream", items=len(cc_data), bytes_written=4*len(cc_data)):
+        cc_stream = create_regular_output(cc_data, os.path.join(respath, cc_output_fname), mmap_streams)
+
+    # Compute bandwidths and errors
+    coverage = values_used/len(cc_data)
+    errorpath = os.path.join(respath, "errorlists")
+    with tracer.stage("calculate_mape", items=len(cc_data)) as counters:
+        rel_err = compute_relative_errors(input_data, cc_data)
+        mape, max_err = summarize_relative_errors(rel_err)
+        if csv_files:
+            files.append(os.path.join(errorpath, "{}_{}.{}".format(date, column_fname, errorlist_format)))
+            write_errorlist(rel_err, os.path.splitext(files[-1])[0], errorlist_format)
+            if tracer.enabled:
+                counters["bytes_written"] = instrument.file_size(files[-1])
+    print("CC coverage:", coverage)
+    print("MAPE:", mape)
+
+    # Compute Shannon entropy
+    with tracer.stage("compute_shannon_entropy", items=len(input_data) + len(cc_data)):
+        entropy_reg = compute_shannon_entropy(input_data)
+        entropy_cc = compute_shannon_entropy(cc_data)
+    print("Shannon entropy regular stream:", entropy_reg)
+    print("Shannon entropy cc stream:", entropy_cc)
+    rows = get_summary_rows(respath, subdir, date, column_fname, period, nn_threshold, values_used, len(cc_data), mape, max_err, entropy_reg, entropy_cc)
+    if entropy_window:
+        with tracer.stage("compute_windowed_entropy", items=len(input_data) + len(cc_data)):
+            ends, entropies_reg = compute_windowed_entropy(input_data, entropy_window, entropy_step)
+            _, entropies_cc = compute_windowed_entropy(cc_data, entropy_window, entropy_step)
+            if csv_files:
+                os.makedirs(os.path.join(respath, "entropies"), exist_ok=True)
+                files.append(os.path.join(respath, "entropies/entropies_{}_{}.csv".format(column_fname, date)))
+                write_windowed_entropies(ends, entropies_reg, entropies_cc, files[-1])
+
+    # Compute bigrams
+    print("Counting bigram occurrences...")
+    with tracer.stage("compute_bigrams", items=len(input_data) + len(cc_data)):
+        bigrams_reg = compute_bigrams_multi(regular_stream, NUM_LAST_DIGITS)
+        bigrams_cc = compute_bigrams_multi(cc_stream, NUM_LAST_DIGITS)
+    with tracer.stage("write_bigrams", items=2*len(NUM_LAST_DIGITS) if csv_files else 0) as counters:
+        bigram_fnames = []
+        for i in range(len(NUM_LAST_DIGITS) if csv_files else 0):
+            # Regular output
+            bigram_fnames.append(os.path.join(respath, "bigrams/bigrams_reg_{}_{}_{}.csv".format(column_fname, date, NUM_LAST_DIGITS[i])))
+            write_bigrams(bigrams_reg[i][1], bigram_fnames[-1])
+            # Output with cc
+            bigram_fnames.append(os.path.join(respath, "bigrams/bigrams_cc_{}_{}_{}.csv".format(column_fname, date, NUM_LAST_DIGITS[i])))
+            write_bigrams(bigrams_cc[i][1], bigram_fnames[-1])
+        files += bigram_fnames
+        if tracer.enabled:
+            counters["bytes_written"] = sum(instrument.file_size(fname) for fname in bigram_fnames)
+
+    # Compute compressibility
+    print("Computing compressibility...")
+    all_compressibilities = {}
+    for output_stream, stream in [(regular_stream, "reg"), (cc_stream, "cc")]:
+        with tracer.stage("compute_compressibility", stream=stream, items=COMPRESSION_NUM_WINDOWS*len(codecs)):
+            # Bytes of the stream as written to file
+            data = output_stream.view(np.uint8)
+            compressibilities = {codec: compute_compressibility(data, codec) for codec in codecs}
+            all_compressibilities[stream] = compressibilities
+            if csv_files:
+                files.append(os.path.join(respath, "compressibilities/compressibilities_{}_{}_{}.csv".format(stream, column_fname, date)))
+                write_compressibilities(compressibilities, files[-1])
+
+    print("Done.")
+    if outputs is not None:
+        outputs += files
+    if record is not None:
+        # Bigrams in order of first occurrence, as passed to write_bigrams()
+        record.update(cell={"period": period, "threshold": nn_threshold, "data_filename": data_filename, "date": date, "column": column_header},
+                      summary={"bits_transmitted": values_used, "total_no_values": len(cc_data), "mape": mape, "max_error": max_err,
+                               "entropy_reg": entropy_reg, "entropy_cc": entropy_cc, "errorlist_format": errorlist_format},
+                      bigrams=[(stream, NUM_LAST_DIGITS[i], bigram[0], bigram[1], occurences)
+                               for stream, bigrams in [("reg", bigrams_reg), ("cc", bigrams_cc)] for i in range(len(NUM_LAST_DIGITS)) for bigram, occurences in bigrams[i][1].items()],
+                      compressibilities={stream: {codec: list(values) for codec, values in compressibilities.items()} for stream, compressibilities in all_compressibilities.items()},
+                      errors=rel_err,
+                      windowed_entropies=list(zip(ends.tolist(), np.asarray(entropies_reg).tolist(), np.asarray(entropies_cc).tolist())) if entropy_window else None)
+    return rows
+
+
+# Evaluate covert channel for one column of a sensor data file and results directories of several thresholds (sharing the nearest neighbor search)
+# Archive of the period is located in parent directory of results directories
+def evaluate_column(input_fname, column_header, respaths):
+    data_filename = os.path.splitext(os.path.split(input_fname)[1])[0]
+    results = [parse_result_path(respath) for respath in respaths]
+    subdir, period, _ = results[0]
+    nn_thresholds = [nn_threshold for _, _, nn_threshold in results]
+    tracer = instrument.tracer
+    with tracer.cell(period=period, threshold=nn_thresholds[0] if len(nn_thresholds) == 1 else nn_thresholds, file=data_filename, column=column_header):
+        with tracer.stage("load_archive") as counters:
+            archive_fname = get_archive_fname(os.path.dirname(os.path.normpath(respaths[0])), get_column_fname(column_header))
+            archive = archivefile.read_archive(archive_fname)
+            counters.update(items=len(archive[0]), bytes_read=instrument.file_size(archive_fname))
+        with tracer.stage("load_sensor_data") as counters:
+            input_data = load_sensor_data(input_fname, [column_header])[column_header]
+            counters["items"] = len(input_data)
+        secret_bits = get_secret_message_bits(read_secret_message(SECRET_MESSAGE_FNAME))
+        neighbors = None
+        if len(respaths) > 1:
+            with tracer.stage("find_neighbors", items=len(input_data)):
+                neighbors = find_neighbors(input_data, archive)
+        rows = []
+        for respath, nn_threshold in zip(respaths, nn_thresholds):
+            rows += evaluate(input_data, data_filename, column_header, respath, archive, secret_bits, subdir, period, nn_threshold, neighbors=neighbors)
+        return rows
+
+
+def main():
+    ################################################################
+    # Preparations
+    ################################################################
+    if len(sys.argv) < 3:
+        print("Please specify input file (including path), column header(s), and path to results directory!")
+        print("Several columns are given as comma-separated list of headers or glob patterns (e.g., 'R*'), they are evaluated in parallel.")
+        print("Further thresholds given after the results directory (<subdir>/.../<period>/<threshold>) are evaluated in directories next to it.")
+        sys.exit(1)
+
+    input_fname = sys.argv[1]
+    # Specify which columns to examine
+    column_headers = sensorfile.select_columns(input_fname, sys.argv[2].split(","))
+    respaths = [sys.argv[3]] + [os.path.join(os.path.dirname(os.path.normpath(sys.argv[3])), nn_threshold) for nn_threshold in sys.argv[4:]]
+    ################################################################
+
+    for respath in respaths:
+        prepare_result_dirs(respath)
+    failed = []
+    if len(column_headers) == 1:
+        rows = [evaluate_column(input_fname, column_headers[0], respaths)]
+    else:
+        # Parse file once, processes evaluating the columns load the cached columns
+        sensorfile.load_columns(input_fname, column_headers)
+        rows = []
+        with ProcessPoolExecutor() as executor:
+            futures = [executor.submit(evaluate_column, input_fname, column_header, respaths) for column_header in column_headers]
+            for column_header, future in zip(column_headers, futures):
+                # Summary rows of the other columns are written anyway
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    print("Evaluation of column {} failed: {!r}".format(column_header, e))
+                    failed.append(column_header)
+    with ResultWriter() as writer:
+        for column_rows in rows:
+            writer.write(column_rows)
+    if failed:
+        print("Failed columns: {}".format(", ".join(failed)))
+        sys.exit(1)
+
@@ -0,0 +1,139 @@
+'''
+Opt-in instrumentation of pipeline stages: time, items processed, bytes read and written, and peak memory of each stage
+are written as json lines (one line per grid cell), stages can be run under cProfile or tracemalloc.
+Enabled by environment variables (see below) or by configure(), e.g. from command line flags of sweep.py.
+'''
+
+
+import os
+import time
+import json
+import resource
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+
+# Trace file (json lines), tracing is disabled if not set
+TRACE_ENV = "CCARCHIVE_TRACE"
+# Comma-separated names of stages run under cProfile, "all" for every stage
+PROFILE_ENV = "CCARCHIVE_PROFILE"
+# Directory of profiles written for stages run under cProfile
+PROFILE_DIR_ENV = "CCARCHIVE_PROFILE_DIR"
+PROFILE_DIR = "./profiles/"
+# Record peak of memory allocated by python and numpy during each stage if set to 1
+TRACEMALLOC_ENV = "CCARCHIVE_TRACEMALLOC"
+
+
+# Process peak resident set size (kB)
+def get_peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Collects stage records, records of stages within a cell are written as one line when the cell is finished,
+# records of stages outside of cells are written immediately
+class Tracer:
+    def __init__(self, trace_fname=None, profile_stages=(), profile_dir=PROFILE_DIR, use_tracemalloc=False):
+        self.trace_fname = trace_fname
+        self.profile_stages = set(profile_stages)
+        self.profile_dir = profile_dir
+        self.use_tracemalloc = use_tracemalloc
+        self.current_cell = None
+        self.num_profiles = 0
+
+    @classmethod
+    def from_env(cls):
+        profile_stages = [stage for stage in os.environ.get(PROFILE_ENV, "").split(",") if stage]
+        return cls(os.environ.get(TRACE_ENV) or None, profile_stages, os.environ.get(PROFILE_DIR_ENV, PROFILE_DIR), os.environ.get(TRACEMALLOC_ENV) == "1")
+
+    @property
+    def enabled(self):
+        return self.trace_fname is not None
+
+    # Settings as keyword arguments of the constructor, e.g. to configure worker processes
+    def get_config(self):
+        return {"trace_fname": self.trace_fname, "profile_stages": sorted(self.profile_stages), "profile_dir": self.profile_dir, "use_tracemalloc": self.use_tracemalloc}
+
+    def write(self, record):
+        record["pid"] = os.getpid()
+        # Single write per line, lines of concurrent processes appending to the same file do not interleave
+        with open(self.trace_fname, 'a') as tf:
+            tf.write(json.dumps(record) + "\n")
+
+    # Group stages of one grid cell, identified by given parameters
+    @contextmanager
+    def cell(self, **params):
+        if not self.enabled:
+            yield None
+            return
+        outer_cell = self.current_cell
+        self.current_cell = {"cell": params, "start": time.time(), "stages": []}
+        start = time.perf_counter()
+        try:
+            yield self.current_cell
+        finally:
+            record = self.current_cell
+            record["seconds"] = time.perf_counter() - start
+            record["peak_rss_kb"] = get_peak_rss()
+            self.current_cell = outer_cell
+            self.write(record)
+
+    # Time one stage, the yielded dict takes counters set by the caller (items, bytes_read, bytes_written)
+    @contextmanager
+    def stage(self, name, **counters):
+        if not self.enabled:
+            yield counters
+            return
+        profiler = None
+        if name in self.profile_stages or "all" in self.profile_stages:
+            profiler = cProfile.Profile()
+        if self.use_tracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced_at_start = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        start_cpu = time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield counters
+        finally:
+            if profiler:
+                profiler.disable()
+            record = {"stage": name, "seconds": time.perf_counter() - start, "cpu_seconds": time.process_time() - start_cpu}
+            record.update(counters)
+            record["peak_rss_kb"] = get_peak_rss()
+            if self.use_tracemalloc:
+                # Peak of memory allocated in addition to memory allocated before the stage
+                record["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1] - traced_at_start
+            if profiler:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                self.num_profiles += 1
+                record["profile"] = os.path.join(self.profile_dir, "{}_{}_{}.prof".format(name, os.getpid(), self.num_profiles))
+                profiler.dump_stats(record["profile"])
+            if self.current_cell is not None:
+                self.current_cell["stages"].append(record)
+            else:
+                record["start"] = time.time() - record["seconds"]
+                self.write(record)
+
+
+tracer = Tracer.from_env()
+
+
+# Replace settings of the module tracer (e.g., from command line flags), arguments not given keep their setting
+def configure(trace_fname=None, profile_stages=None, profile_dir=None, use_tracemalloc=None):
+    if trace_fname is not None:
+        tracer.trace_fname = trace_fname
+    if profile_stages is not None:
+        tracer.profile_stages = set(profile_stages)
+    if profile_dir is not None:
+        tracer.profile_dir = profile_dir
+    if use_tracemalloc is not None:
+        tracer.use_tracemalloc = use_tracemalloc
+
+
+# Size of file in bytes, 0 if it does not exist
+def file_size(fname):
+    return os.path.getsize(fname) if os.path.exists(fname) else 0
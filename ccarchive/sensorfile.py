@@ -0,0 +1,125 @@
+'''
+Reads columns of sensor data csv files, parsed columns are cached as memory-mappable .npy files.
+Usage: python -m ccarchive.sensorfile <sensor data file> <column header or pattern>... (builds cache)
+'''
+
+
+import sys
+import os
+import glob
+import re
+import zlib
+import csv
+from fnmatch import fnmatchcase
+import numpy as np
+from . import instrument
+
+
+COLUMN_CACHE_DIR = "./column_cache/"
+# Number of rows parsed at once
+CHUNK_SIZE = 10**6
+COLUMN_DTYPE = np.float64
+
+
+def get_column_fname(column_header):
+    return column_header.replace(" ", "_").replace("/", "-")
+
+
+# Column headers of a sensor data file (first line)
+def get_column_headers(fname):
+    with open(fname, newline='') as f:
+        return next(csv.reader(f), [])
+
+
+# Select columns of a sensor data file by headers or glob patterns (e.g., "R*"), in order of the file
+def select_columns(fname, patterns):
+    column_headers = get_column_headers(fname)
+    for pattern in patterns:
+        if not any(fnmatchcase(column_header, pattern) for column_header in column_headers):
+            raise ValueError("No column of {} matches {}!".format(fname, pattern))
+    return [column_header for column_header in column_headers if any(fnmatchcase(column_header, pattern) for pattern in patterns)]
+
+
+# Yield chunks of given columns only, as data frames of floats
+def read_chunks(fname, column_headers, chunk_size=CHUNK_SIZE):
+    # Imported on first use, cached columns are loaded without pandas
+    import pandas as pd
+    yield from pd.read_csv(fname, usecols=column_headers, dtype={column_header: COLUMN_DTYPE for column_header in column_headers}, chunksize=chunk_size)
+
+
+# Cached column of a file is identified by path of the file, column, and size and modification time of the file
+def get_cache_prefix(fname, column_header, cache_dir):
+    stem = os.path.splitext(os.path.basename(fname))[0]
+    return os.path.join(cache_dir, "{}_{:08x}_{}_".format(stem, zlib.crc32(os.path.abspath(fname).encode()), get_column_fname(column_header)))
+
+
+# Size and modification time of the file
+CACHE_SUFFIX = re.compile(r"\d+_\d+\.npy")
+
+
+def get_cache_fname(fname, column_header, cache_dir):
+    stat = os.stat(fname)
+    return get_cache_prefix(fname, column_header, cache_dir) + "{}_{}.npy".format(stat.st_size, stat.st_mtime_ns)
+
+
+# Parse file chunk by chunk and write given columns to .npy files, memory use does not depend on file size
+def build_cache(fname, cache_fnames, chunk_size=CHUNK_SIZE):
+    column_headers = list(cache_fnames)
+    tmp_fnames = {column_header: "{}.{}.tmp".format(cache_fnames[column_header], os.getpid()) for column_header in column_headers}
+    tmp_files = {column_header: open(tmp_fnames[column_header], 'wb') for column_header in column_headers}
+    num_rows = 0
+    for chunk in read_chunks(fname, column_headers, chunk_size):
+        for column_header in column_headers:
+            chunk[column_header].to_numpy(dtype=COLUMN_DTYPE).tofile(tmp_files[column_header])
+        num_rows += len(chunk)
+    for column_header in column_headers:
+        tmp_files[column_header].close()
+        part_fname = tmp_fnames[column_header] + ".npy"
+        if num_rows:
+            # Number of rows is only known now, copy raw values into .npy file block by block
+            raw = np.memmap(tmp_fnames[column_header], dtype=COLUMN_DTYPE, mode='r', shape=(num_rows,))
+            column = np.lib.format.open_memmap(part_fname, mode='w+', dtype=COLUMN_DTYPE, shape=(num_rows,))
+            for start in range(0, num_rows, chunk_size):
+                column[start:start+chunk_size] = raw[start:start+chunk_size]
+            column.flush()
+            del raw, column
+        else:
+            np.save(part_fname, np.empty(0, dtype=COLUMN_DTYPE))
+        os.remove(tmp_fnames[column_header])
+        # Concurrent processes building the same column replace it by identical content
+        os.replace(part_fname, cache_fnames[column_header])
+
+
+# Remove cached columns of previous versions of the file
+# Only files with prefix followed by size and modification time, e.g., not cached columns of another column whose name extends this one
+def remove_stale(fname, column_header, cache_fname, cache_dir):
+    prefix = get_cache_prefix(fname, column_header, cache_dir)
+    for stale_fname in glob.glob(glob.escape(prefix) + "*.npy"):
+        if stale_fname != cache_fname and CACHE_SUFFIX.fullmatch(stale_fname[len(prefix):]):
+            os.remove(stale_fname)
+
+
+# Return given columns of sensor data file as (read-only, memory-mapped) arrays, parse file only if not cached
+# No caching if cache_dir is None
+def load_columns(fname, column_headers, cache_dir=COLUMN_CACHE_DIR, chunk_size=CHUNK_SIZE):
+    if cache_dir is None:
+        chunks = list(read_chunks(fname, column_headers, chunk_size))
+        return {column_header: np.concatenate([chunk[column_header].to_numpy(dtype=COLUMN_DTYPE) for chunk in chunks]) if chunks else np.empty(0, dtype=COLUMN_DTYPE)
+                for column_header in column_headers}
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_fnames = {column_header: get_cache_fname(fname, column_header, cache_dir) for column_header in column_headers}
+    missing = {column_header: cache_fname for column_header, cache_fname in cache_fnames.items() if not os.path.exists(cache_fname)}
+    if missing:
+        for column_header, cache_fname in missing.items():
+            remove_stale(fname, column_header, cache_fname, cache_dir)
+        with instrument.tracer.stage("parse_csv", items=len(missing), bytes_read=os.path.getsize(fname)):
+            build_cache(fname, missing, chunk_size)
+    return {column_header: np.load(cache_fname, mmap_mode='r') for column_header, cache_fname in cache_fnames.items()}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Please specify sensor data file and columns!")
+        sys.exit(1)
+    for column_header, column in load_columns(sys.argv[1], select_columns(sys.argv[1], sys.argv[2:])).items():
+        print("{}: {} values".format(column_header, len(column)))
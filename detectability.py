@@ -0,0 +1,166 @@
+'''
+Statistical detectability tests of all grid cells at once: distances between bigram distributions of regular and cc streams
+(chi-square test, Kullback-Leibler and Jensen-Shannon divergence) and Kolmogorov-Smirnov test of their compressibilities.
+Usage: python detectability.py <database> <output file> [<subdir>] (cells of results store, see resultstore.py)
+'''
+
+
+import sys
+import numpy as np
+import ccarchive
+import resultstore
+
+
+# Summary table of all cells, located in top-level results directory
+STATISTICS_FNAME = "detectability.csv"
+# Added to each bigram count for Kullback-Leibler divergence, which is undefined for bigrams missing in the cc stream otherwise
+KL_PSEUDOCOUNT = 0.5
+# Columns of bigram arrays (see get_bigram_array())
+CELL, IS_CC, NUM_BITS, FIRST, SECOND, OCCURENCES = range(6)
+
+
+# Bigrams of all cells as one array, one row (cell index, 1 if cc stream, number of bits, first, second, occurences) per bigram
+def get_bigram_array(records):
+    bigrams = [(i, stream == "cc", num_bits, first, second, occurences) for i, record in enumerate(records) for stream, num_bits, first, second, occurences in record["bigrams"]]
+    return np.array(bigrams, dtype=np.int64).reshape(-1, 6)
+
+
+# Compressibilities of all cells for each codec as arrays of regular and cc streams (cells x windows), cells without codec are NaN
+def get_compressibility_arrays(records):
+    codecs = sorted({codec for record in records for compressibilities in record["compressibilities"].values() for codec in compressibilities})
+    arrays = {}
+    for codec in codecs:
+        num_windows = max(len(compressibilities.get(codec, [])) for record in records for compressibilities in record["compressibilities"].values())
+        arrays[codec] = tuple(np.full((len(records), num_windows), np.nan) for _ in range(2))
+        for i, record in enumerate(records):
+            for stream, values in [("reg", record["compressibilities"].get("reg", {}).get(codec, [])), ("cc", record["compressibilities"].get("cc", {}).get(codec, []))]:
+                arrays[codec][stream == "cc"][i, :len(values)] = values
+    return arrays
+
+
+# Bigram counts of regular and cc streams of all cells for given number of bits (cells x 4**num_bits), indexed by first << num_bits | second
+def get_count_matrices(bigrams, num_cells, num_bits):
+    bigrams = bigrams[bigrams[:, NUM_BITS] == num_bits]
+    num_codes = 4**num_bits
+    index = (bigrams[:, IS_CC]*num_cells + bigrams[:, CELL])*num_codes + (bigrams[:, FIRST] << num_bits | bigrams[:, SECOND])
+    counts = np.bincount(index, weights=bigrams[:, OCCURENCES], minlength=2*num_cells*num_codes).reshape(2, num_cells, num_codes)
+    return counts[0], counts[1]
+
+
+# Chi-square test of homogeneity of regular and cc bigram counts (2 x bigrams contingency table of each cell), returns statistic, degrees of freedom, and p-value
+def chi_square(reg, cc):
+    # Imported on first use, loading scipy takes about a second
+    from scipy import stats
+    total = reg + cc
+    observed = total > 0
+    num = reg.sum(axis=1, keepdims=True) + cc.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected_reg = reg.sum(axis=1, keepdims=True)*total/num
+        expected_cc = cc.sum(axis=1, keepdims=True)*total/num
+        statistic = np.where(observed, (reg - expected_reg)**2/expected_reg + (cc - expected_cc)**2/expected_cc, 0).sum(axis=1)
+    dof = np.maximum(observed.sum(axis=1) - 1, 0)
+    p_value = np.where(dof > 0, stats.chi2.sf(statistic, np.maximum(dof, 1)), 1.0)
+    return statistic, dof, p_value
+
+
+# Normalize counts of each cell to probabilities
+def to_probabilities(counts):
+    with np.errstate(invalid='ignore'):
+        return counts/counts.sum(axis=1, keepdims=True)
+
+
+# Sum of p*log2(p/q) of each cell, terms with p = 0 are 0
+def relative_entropy(p, q):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(p > 0, p*np.log2(p/q), 0).sum(axis=1)
+
+
+# Kullback-Leibler divergence (bits) of cc from regular bigram distribution, counts are smoothed by pseudocount
+def kl_divergence(reg, cc, pseudocount=KL_PSEUDOCOUNT):
+    return relative_entropy(to_probabilities(reg + pseudocount), to_probabilities(cc + pseudocount))
+
+
+# Jensen-Shannon divergence (bits) of regular and cc bigram distributions
+def js_divergence(reg, cc):
+    p = to_probabilities(reg)
+    q = to_probabilities(cc)
+    m = (p + q)/2
+    return (relative_entropy(p, m) + relative_entropy(q, m))/2
+
+
+# Two-sample Kolmogorov-Smirnov test of each row of a and b (NaN entries are missing), returns statistic and p-value
+# (p-value of scipy.stats.ks_2samp() with default method, i.e., exact for small samples)
+def ks_test(a, b):
+    from scipy import stats
+    n = np.sum(~np.isnan(a), axis=1)
+    m = np.sum(~np.isnan(b), axis=1)
+    points = np.concatenate((a, b), axis=1)
+    # Empirical distribution functions at all points of both samples (NaN compares False)
+    with np.errstate(invalid='ignore'):
+        cdf_a = (a[:, None, :] <= points[:, :, None]).sum(axis=2)/n[:, None]
+        cdf_b = (b[:, None, :] <= points[:, :, None]).sum(axis=2)/m[:, None]
+        statistic = np.abs(cdf_a - cdf_b).max(axis=1, initial=0)
+    p_value = np.array([stats.ks_2samp(row_a[~np.isnan(row_a)], row_b[~np.isnan(row_b)]).pvalue if n_row > 0 and m_row > 0 else np.nan
+                        for row_a, row_b, n_row, m_row in zip(a, b, n, m)])
+    return statistic, p_value
+
+
+# Test all cells given by records (filled by ccarchive.evaluate(), cached or loaded from results store), returns header and lines of summary table
+def compute_statistics(records, bigrams=None, compressibilities=None):
+    bigrams = get_bigram_array(records) if bigrams is None else bigrams
+    compressibilities = get_compressibility_arrays(records) if compressibilities is None else compressibilities
+    all_num_bits = sorted(set(bigrams[:, NUM_BITS].tolist()), reverse=True)
+    header = ["date", "column", "period", "threshold", "entropy_diff"]
+    columns = [np.array([record["summary"]["entropy_cc"] - record["summary"]["entropy_reg"] for record in records])]
+    for num_bits in all_num_bits:
+        reg, cc = get_count_matrices(bigrams, len(records), num_bits)
+        header += ["chi2_{}".format(num_bits), "chi2_dof_{}".format(num_bits), "chi2_p_{}".format(num_bits), "kl_{}".format(num_bits), "js_{}".format(num_bits)]
+        columns += list(chi_square(reg, cc)) + [kl_divergence(reg, cc), js_divergence(reg, cc)]
+    for codec, (reg, cc) in compressibilities.items():
+        header += ["ks_{}".format(codec), "ks_p_{}".format(codec)]
+        columns += list(ks_test(reg, cc))
+    columns = [column.tolist() for column in columns]
+    lines = []
+    for i, record in enumerate(records):
+        cell = record["cell"]
+        fields = [cell["date"], ccarchive.get_column_fname(cell["column"]), cell["period"], cell["threshold"]] + [column[i] for column in columns]
+        lines.append(",".join(str(field) for field in fields) + "\n")
+    return ",".join(header) + "\n", lines
+
+
+# Records of cells in results store (see resultstore.py) with the data needed by compute_statistics(), bigrams and compressibilities as arrays
+def load_store(store, subdir=None):
+    conn = store.conn
+    where = " WHERE subdir = ?" if subdir is not None else ""
+    params = (subdir,) if subdir is not None else ()
+    cells = conn.execute("SELECT id, period, threshold, data_filename, date, column_name, entropy_reg, entropy_cc FROM cells" + where + " ORDER BY id", params).fetchall()
+    cell_ids = np.array([cell[0] for cell in cells], dtype=np.int64)
+    records = [{"cell": {"period": period, "threshold": threshold, "data_filename": data_filename, "date": date, "column": column_header},
+                "summary": {"entropy_reg": entropy_reg, "entropy_cc": entropy_cc}}
+               for _, period, threshold, data_filename, date, column_header, entropy_reg, entropy_cc in cells]
+    cell_filter = " WHERE cell_id IN (SELECT id FROM cells" + where + ")"
+    bigrams = np.array(conn.execute("SELECT cell_id, stream = 'cc', num_bits, first, second, occurences FROM bigrams" + cell_filter, params).fetchall(), dtype=np.int64).reshape(-1, 6)
+    bigrams[:, CELL] = np.searchsorted(cell_ids, bigrams[:, CELL])
+    compressibilities = {}
+    for (codec,) in conn.execute("SELECT DISTINCT codec FROM compressibilities" + cell_filter + " ORDER BY codec", params).fetchall():
+        rows = np.array(conn.execute("SELECT cell_id, stream = 'cc', offset, compressibility FROM compressibilities" + cell_filter + " AND codec = ?", params + (codec,)).fetchall()).reshape(-1, 4)
+        cell_index = np.searchsorted(cell_ids, rows[:, 0].astype(np.int64))
+        is_cc = rows[:, 1].astype(bool)
+        window = (rows[:, 2] // ccarchive.COMPRESSION_STRIDE).astype(np.int64)
+        arrays = tuple(np.full((len(cells), window.max() + 1 if len(window) else 0), np.nan) for _ in range(2))
+        for j, array in enumerate(arrays):
+            array[cell_index[is_cc == j], window[is_cc == j]] = rows[is_cc == j, 3]
+        compressibilities[codec] = arrays
+    return records, bigrams, compressibilities
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Please specify database and output file!")
+        sys.exit(1)
+    with resultstore.ResultStore(sys.argv[1]) as store:
+        records, bigrams, compressibilities = load_store(store, sys.argv[3] if len(sys.argv) > 3 else None)
+    header, lines = compute_statistics(records, bigrams, compressibilities)
+    with open(sys.argv[2], 'w') as sf:
+        sf.write(header)
+        sf.writelines(lines)
@@ -0,0 +1,201 @@
+'''
+Online detector, computes detectability metrics of a sensor data stream as values arrive, using bounded memory.
+'''
+
+
+import sys
+import json
+import math
+import argparse
+from contextlib import ExitStack
+import numpy as np
+import ccarchive
+from ccarchive import sensorfile
+
+
+# Metrics are reported every REPORT_EVERY values
+REPORT_EVERY = 1000
+# Number of most recent values used for entropy
+ENTROPY_WINDOW = 1000
+# Number of values read at once from files
+CHUNK_SIZE = 4096
+# Reports used to learn mean and standard deviation of each metric before alerts are raised
+CALIBRATION_REPORTS = 10
+# Alert if metric deviates from its calibrated mean by more than given number of standard deviations
+Z_THRESHOLD = 4.0
+
+
+# Counts bigrams of the last num_bits bits of consecutive values since the last report
+class BigramCounter:
+    def __init__(self, num_bits):
+        self.num_bits = num_bits
+        self.interval_counts = np.zeros(4**num_bits, dtype=np.int64)
+        self.last = None
+
+    def update(self, values):
+        last_bits = values.astype(np.int64) & (2**self.num_bits - 1)
+        if self.last is not None:
+            last_bits = np.concatenate(([self.last], last_bits))
+        if len(last_bits):
+            self.last = last_bits[-1]
+        counts = np.bincount((last_bits[:-1] << self.num_bits) | last_bits[1:], minlength=4**self.num_bits)
+        self.interval_counts += counts
+
+    def reset_interval(self):
+        self.interval_counts[:] = 0
+
+
+# Keeps the most recent bytes of the stream for compressibility
+class RollingWindow:
+    def __init__(self, size):
+        self.size = size
+        self.buffer = bytearray()
+
+    def update(self, data):
+        self.buffer += data
+        if len(self.buffer) > 2*self.size:
+            del self.buffer[:-self.size]
+
+    def compressibility(self, codec):
+        window = bytes(self.buffer[-self.size:])
+        return len(window)/len(ccarchive.COMPRESSORS[codec](window)) if window else None
+
+
+# Mean and variance of a metric (Welford's algorithm)
+class RunningStats:
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta/self.n
+        self.m2 += delta*(x - self.mean)
+
+    def std(self):
+        return math.sqrt(self.m2/(self.n - 1)) if self.n > 1 else 0.0
+
+
+# Consumes a stream of big-endian float32 values chunk by chunk, emits a report every report_every values
+# Work per value is constant (amortized), memory does not depend on stream length
+class StreamingDetector:
+    def __init__(self, report_every=REPORT_EVERY, entropy_window=ENTROPY_WINDOW, compression_window=ccarchive.COMPRESSION_WINDOW, codecs=ccarchive.COMPRESSION_CODECS,
+                 num_last_digits=ccarchive.NUM_LAST_DIGITS, calibration_reports=CALIBRATION_REPORTS, z_threshold=Z_THRESHOLD, limits=None):
+        self.report_every = report_every
+        self.codecs = codecs
+        self.entropy = ccarchive.SlidingEntropy(entropy_window)
+        self.window = RollingWindow(compression_window)
+        self.bigrams = [BigramCounter(num_bits) for num_bits in num_last_digits]
+        self.calibration_reports = calibration_reports
+        self.z_threshold = z_threshold
+        # Fixed limits: metric -> (minimum, maximum), either may be None
+        self.limits = limits or {}
+        self.stats = {}
+        self.values_seen = 0
+        self.pending = b""
+
+    # Process received bytes, returns reports completed by them
+    def feed(self, data):
+        data = self.pending + data
+        usable = len(data)//4*4
+        self.pending = data[usable:]
+        values = np.frombuffer(data, dtype='>u4', count=usable//4)
+        reports = []
+        pos = 0
+        while pos < len(values):
+            # Process up to next report boundary
+            num = min(len(values) - pos, self.report_every - self.values_seen % self.report_every)
+            segment = values[pos:pos+num]
+            for bigram_counter in self.bigrams:
+                bigram_counter.update(segment)
+            for symbol in segment.tolist():
+                self.entropy.add(symbol)
+            self.window.update(data[4*pos:4*(pos+num)])
+            self.values_seen += num
+            pos += num
+            if self.values_seen % self.report_every == 0:
+                reports.append(self.report())
+        return reports
+
+    def report(self):
+        metrics = {"entropy": self.entropy.entropy()}
+        for codec in self.codecs:
+            metrics["compressibility_{}".format(codec)] = self.window.compressibility(codec)
+        for bigram_counter in self.bigrams:
+            counts = bigram_counter.interval_counts[bigram_counter.interval_counts > 0]
+            metrics["bigram_entropy_{}".format(bigram_counter.num_bits)] = ccarchive.entropy_of_counts(counts) if len(counts) else 0.0
+            bigram_counter.reset_interval()
+        alerts = self.check(metrics)
+        return {"values": self.values_seen, "metrics": metrics, "alerts": alerts}
+
+    # Compare metrics with fixed limits and with calibrated distribution
+    def check(self, metrics):
+        alerts = []
+        for name, value in metrics.items():
+            if value is None:
+                continue
+            lower, upper = self.limits.get(name, (None, None))
+            if (lower is not None and value < lower) or (upper is not None and value > upper):
+                alerts.append({"metric": name, "value": value, "limits": [lower, upper]})
+            stats = self.stats.setdefault(name, RunningStats())
+            if stats.n >= self.calibration_reports:
+                std = stats.std()
+                if std > 0 and abs(value - stats.mean)/std > self.z_threshold:
+                    alerts.append({"metric": name, "value": value, "z": (value - stats.mean)/std})
+            else:
+                stats.update(value)
+        return alerts
+
+
+# Yield chunks of binary stream (file or pipe), returns as soon as data is available
+def read_stream(f, chunk_size=CHUNK_SIZE):
+    read = f.read1 if hasattr(f, "read1") else f.read
+    while True:
+        data = read(4*chunk_size)
+        if not data:
+            break
+        yield data
+
+
+# Yield chunks of one column of a sensor data csv file as big-endian float32 values
+def read_csv_column(fname, column_header, chunk_size=CHUNK_SIZE):
+    for chunk in sensorfile.read_chunks(fname, [column_header], chunk_size):
+        yield chunk[column_header].to_numpy().astype('>f4').tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute detectability metrics of a sensor data stream online.")
+    parser.add_argument("source", help="binary stream file (big-endian float32), '-' for standard input (e.g., piped from server.py --raw-output), or csv file")
+    parser.add_argument("--column", default=None, help="column of csv file")
+    parser.add_argument("--report-every", type=int, default=REPORT_EVERY, help="values between reports")
+    parser.add_argument("--entropy-window", type=int, default=ENTROPY_WINDOW, help="most recent values used for entropy")
+    parser.add_argument("--compression-window", type=int, default=ccarchive.COMPRESSION_WINDOW, help="most recent bytes used for compressibility")
+    parser.add_argument("--codecs", nargs='+', default=ccarchive.COMPRESSION_CODECS, choices=list(ccarchive.COMPRESSORS), help="codecs used for compressibility")
+    parser.add_argument("--calibration-reports", type=int, default=CALIBRATION_REPORTS, help="reports used for calibration of alerts")
+    parser.add_argument("--z-threshold", type=float, default=Z_THRESHOLD, help="standard deviations from calibrated mean raising an alert")
+    parser.add_argument("--min-entropy", type=float, default=None, help="alert if entropy falls below this value")
+    parser.add_argument("--max-compressibility", type=float, default=None, help="alert if gzip compressibility exceeds this value")
+    args = parser.parse_args()
+
+    limits = {"entropy": (args.min_entropy, None), "compressibility_gzip": (None, args.max_compressibility)}
+    detector = StreamingDetector(args.report_every, args.entropy_window, args.compression_window, args.codecs,
+                                 calibration_reports=args.calibration_reports, z_threshold=args.z_threshold, limits=limits)
+    with ExitStack() as stack:
+        if args.source == "-":
+            chunks = read_stream(sys.stdin.buffer)
+        elif args.source.endswith(".csv"):
+            if args.column is None:
+                print("Please specify column of csv file!")
+                sys.exit(1)
+            chunks = read_csv_column(args.source, args.column)
+        else:
+            chunks = read_stream(stack.enter_context(open(args.source, 'rb')))
+        for chunk in chunks:
+            for report in detector.feed(chunk):
+                print(json.dumps(report), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,35 +7,28 @@
 fnames='20161013_143355.csv 20161014_184659.csv 20161016_053656.csv'
 periods='0.0001 0.001 0.01 0.1 1 10'
 nnthresholds='10 100 1000 10000'
-colnames='Flow_rate_(mL-min) R1_(MOhm)'
+# Columns (headers or glob patterns, e.g. 'R*') as accepted by ccarchive.collect_data and sweep.py
+colnames=('Flow rate (mL/min)' 'R1 (MOhm)')
 
 rm -r $1
 mkdir -p $1
 
 # Simulate archiving phase
-python collect_data.py $1
+python -m ccarchive.collect_data $1 --columns "${colnames[@]}"
 pushd .
 cd $1
 for period in $periods
 do
     mkdir ${period}days
-    for colname in $colnames
+    # Archives of all columns
+    for fname in values_with_nearest_neighbors_${period}_days_*
     do
-        mv values_with_nearest_neighbors_${period}_days_${colname}.csv ${period}days/values_with_nearest_neighbors_${colname}.csv
+        if [ -f "$fname" ]; then
+            mv "$fname" "${period}days/values_with_nearest_neighbors_${fname#values_with_nearest_neighbors_${period}_days_}"
+        fi
     done
 done
 popd
 
-# Simulate active phase
-for period in $periods
-do
-    for nnthreshold in $nnthresholds
-    do
-        mkdir $1/${period}days/$nnthreshold
-        for fname in $fnames;
-        do
-            python ccarchive.py ./sensor_data/$fname 'Flow rate (mL/min)' $1/${period}days/$nnthreshold
-            python ccarchive.py ./sensor_data/$fname 'R1 (MOhm)' $1/${period}days/$nnthreshold
-        done
-    done
-done
+# Simulate active phase (all periods, thresholds, files, and columns from data loaded once)
+python sweep.py $1 --files $fnames --periods $periods --thresholds $nnthresholds --columns "${colnames[@]}"
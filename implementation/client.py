@@ -6,24 +6,46 @@ Implements sender for experimental evaluation of archive-based covert channel.
 import socket
 import sys
 import os
-import pandas as pd
+import argparse
+import numpy as np
 import time
 import random
 import struct
-from itertools import count, filterfalse
-from bisect import bisect_left
+import tracemalloc
+from array import array
+# Repository root, the ccarchive package is used without installation
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+# Same covert channel and neighbor mapping as the simulation, imported without pandas (see ../ccarchive/channel.py)
+from ccarchive.channel import RANDOM_NEIGHBORS, find_nearest, map_nearest_new, read_secret_message, get_secret_message_bit_gen
+from ccarchive import sensorfile
 
 
 # Match entries in server.py
 #HOST = "192.168.137.31"
 HOST = "132.176.77.133"
 PORT = 44544
+# Header of frames sent over persistent connections: number of values, send time (ns), followed by the values
+FRAME_HEADER = '!IQ'
+# Largest number of values per frame accepted by server.py
+MAX_FRAME_VALUES = 2**20
+# Optional timestamp (ns, virtual clock of the sensor) preceding each value, see VirtualClock
+TIMESTAMP_FORMAT = '!q'
+# Sampling rate of the sensor (Hz)
+SAMPLE_RATE = 3.5
+# Percentiles of per-sample process times reported in results.csv
+CPU_PERCENTILES = [50, 99]
+# Optional first message on persistent connections identifying the stream (see fleet_server.py): length, utf-8 stream id
+HELLO_HEADER = '!H'
 
-data = " ".join(sys.argv[1:])
 MAXDIGITS = 8 # Should be multiple of 2
 SECRET_MESSAGE_FNAME = "../pseudos.bin.gpg"
-MAXVAL = 10**8 - 1
-RANDOM_NEIGHBORS = True
+# Flags of lookup table entries (see LookupTable)
+ARCHIVED_FLAG = 1
+TIE_FLAG = 2
+# Maximum number of lookup table entries (4 bytes each), archives spanning larger ranges use neighbors and find_nearest()
+MAX_TABLE_SIZE = 2**26
+# Entries of lookup table computed at once, bounds memory needed by the build beyond the table itself
+TABLE_CHUNK_SIZE = 2**16
 
 
 # Produce regular output value
@@ -57,150 +79,345 @@ def create_cc_data(datum, secret_msg_gen, archive, neighbors):
             return create_regular_output(datum) 
 
 
-# Determine closest value in given (ordered) list of collected data for input datum
-def find_nearest(datum, data):
-    if datum >= data[-1]:
-        return data[-1]
-    if datum <= data[0]:
-        return data[0]
-    # Determine position for datum in given (ordered) list
-    ind = bisect_left(data,datum)
-    # If distance to both neighbors is equal, choose randomly if random choice is specified (see above)
-    if data[ind] - datum == datum - data[ind-1] and RANDOM_NEIGHBORS:
-        return random.choice([data[ind], data[ind-1]])
-    # Deterministically always choose upper neighbor in case of equidistanced neighbors
-    if datum - data[ind-1] < data[ind] - datum:
-        return data[ind-1]
-    return data[ind]
-
-
-# Find neighbors *not* in archive for archived value
-# Alternative implementation mitigating execution speed issues
-def find_nearest_new(datum, gapgen, lower, upper):
-    while datum > upper:
-        lower = upper
-        upper = next(gapgen)
-    if lower < 0 and upper > MAXVAL:
-        raise ValueError("No nearest value found in feasible interval!")
-    if datum - lower < upper - datum or upper > MAXVAL:
-        return [lower], lower, upper
-    if datum - lower > upper - datum or lower < 0:
-        return [upper], lower, upper
-    # Both neighbors are within feasible interval and distances are equal
-    return [lower, upper], lower, upper
-
-
-# Each call of next() yields 1 bit of secret message
-def get_secret_message_bit_gen(msg):
-    for byte in msg:
-        for i in reversed(range(8)):
-            yield (byte>>i)&1
+# Create output with embedded cc using lookup table, random_bit chooses between equidistant neighbors
+def create_cc_data_table(datum, secret_bit, table, random_bit):
+    datum_int = round(datum*10000)
+    entry = table.lookup(datum_int)
+    # Secret bit 0 is sent as archived value, 1 as value not in archive
+    if secret_bit != entry & ARCHIVED_FLAG:
+        return create_regular_output(datum)
+    nearest = entry >> 2
+    if entry & TIE_FLAG and RANDOM_NEIGHBORS and random_bit:
+        # Lower neighbor is at the same distance as upper one
+        nearest = 2*datum_int - nearest
+    return create_regular_output(nearest/10000)
+
+
+# Load binary archive (see ../ccarchive/archivefile.py), return sorted archived values and map of their nearest non-archived neighbor(s)
+def load_archive(fname):
+    values, lower, upper = np.load(fname, mmap_mode='r')
+    archive = values.tolist()
+    neighbors = {value: [low] if low == up else [low, up] for value, low, up in zip(archive, lower.tolist(), upper.tolist())}
+    return archive, neighbors
+
+
+# Dense table over the range of archived values (and one value below and above), built once in neighbor mapping phase
+# Entry of each value: nearest value (upper one if both are at equal distance) << 2 | TIE_FLAG if both are at equal distance | ARCHIVED_FLAG if value is archived
+# For archived values, nearest values are nearest non-archived values (see map_nearest_new()), for other values nearest archived values (see find_nearest())
+class LookupTable:
+    def __init__(self, values, nearest_lower, nearest_upper):
+        values = np.asarray(values, dtype=np.int64)
+        nearest_upper = np.asarray(nearest_upper, dtype=np.int64)
+        archived_flags = ARCHIVED_FLAG | np.where(np.asarray(nearest_lower) != nearest_upper, TIE_FLAG, 0)
+        self.base = int(values[0]) - 1
+        self.last = int(values[-1]) + 1 - self.base
+        offsets = values - self.base
+        self.table = array('i', [0])*(self.last + 1)
+        # Entries are computed chunk by chunk and written into the table in place
+        entries = np.frombuffer(self.table, dtype=np.int32)
+        for start in range(0, self.last + 1, TABLE_CHUNK_SIZE):
+            positions = np.arange(self.base + start, self.base + min(start + TABLE_CHUNK_SIZE, self.last + 1))
+            ind = np.searchsorted(values, positions)
+            prev_values = values[np.maximum(ind - 1, 0)]
+            next_values = values[np.minimum(ind, len(values) - 1)]
+            nearest = np.where(next_values - positions <= positions - prev_values, next_values, prev_values)
+            flags = np.where(next_values - positions == positions - prev_values, TIE_FLAG, 0)
+            # Archived values within chunk
+            first, end = np.searchsorted(offsets, [start, start + len(positions)])
+            nearest[offsets[first:end] - start] = nearest_upper[first:end]
+            flags[offsets[first:end] - start] = archived_flags[first:end]
+            entries[start:start + len(positions)] = nearest << 2 | flags
+        del entries
+
+    @staticmethod
+    def get_size(values):
+        return int(values[-1]) - int(values[0]) + 3
+
+    @property
+    def nbytes(self):
+        return self.table.itemsize*len(self.table)
+
+    # Values below or above the range of the archive share the entry of the value next to the range
+    def lookup(self, datum_int):
+        offset = datum_int - self.base
+        if offset < 0:
+            offset = 0
+        elif offset > self.last:
+            offset = self.last
+        return self.table[offset]
+
+
+# Precomputed random bits choosing between equidistant neighbors, one per value
+def get_random_bits(num_bits):
+    return np.unpackbits(np.frombuffer(random.randbytes((num_bits + 7)//8), dtype=np.uint8))[:num_bits].tolist()
+
+
+# Create message identifying stream
+def create_hello(stream_id):
+    stream_id = stream_id.encode()
+    return struct.pack(HELLO_HEADER, len(stream_id)) + stream_id
+
+
+# Create frame of values (packed by create_regular_output() or create_cc_data()) sent at given time
+def create_frame(payloads, sent_ns):
+    return struct.pack(FRAME_HEADER, len(payloads), sent_ns) + b"".join(payloads)
+
+
+# Sends each value over a new connection
+class ConnectionPerSampleSender:
+    def __init__(self, host, port):
+        self.address = (host, port)
+
+    def send(self, payload):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            # Connect to server and send data
+            sock.connect(self.address)
+            sock.sendall(payload)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# Sends values over one persistent connection, batch_size values per frame
+class StreamSender:
+    def __init__(self, host, port, batch_size, stream_id=None):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if stream_id is not None:
+            self.sock.sendall(create_hello(stream_id))
+        self.batch_size = batch_size
+        self.batch = []
+
+    def send(self, payload):
+        self.batch.append(payload)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.sock.sendall(create_frame(self.batch, time.time_ns()))
+            self.batch = []
+
+    def close(self):
+        self.flush()
+        self.sock.close()
+
+
+# Virtual clock of the sensor: sample i is taken i/SAMPLE_RATE seconds after start (optionally with normal jitter of given standard deviation),
+# samples are sent speedup times as fast as in real time, as fast as the transport allows if speedup is 0
+# Optionally records process time of each sample (from one tick() to the next, without pausing)
+class VirtualClock:
+    def __init__(self, speedup=1, timestamps=False, jitter=0, record_cpu=False, seed=2502):
+        self.interval = 1/(SAMPLE_RATE*speedup) if speedup else 0
+        self.timestamps = timestamps
+        self.jitter_ns = jitter*10**9
+        # Separate generator, random choices of the covert channel are not affected
+        self.rng = random.Random(seed)
+        self.start_ns = time.time_ns()
+        self.samples = 0
+        self.record_cpu = record_cpu
+        self.cpu_times = array('q')
+        self.last_cpu_ns = time.process_time_ns()
+        self.phase_start = time.monotonic()
+        self.phase_samples = 0
+
+    # Start recording process times and sending schedule of a new phase
+    def start_phase(self):
+        self.cpu_times = array('q')
+        self.last_cpu_ns = time.process_time_ns()
+        self.phase_start = time.monotonic()
+        self.phase_samples = 0
+
+    # Prepend timestamp of current sample to payload if timestamps are sent
+    def stamp(self, payload):
+        if not self.timestamps:
+            return payload
+        timestamp = self.start_ns + round(self.samples*10**9/SAMPLE_RATE)
+        if self.jitter_ns:
+            timestamp += round(self.rng.gauss(0, self.jitter_ns))
+        return struct.pack(TIMESTAMP_FORMAT, timestamp) + payload
+
+    # Advance to next sample
+    def tick(self):
+        if self.record_cpu:
+            self.cpu_times.append(time.process_time_ns() - self.last_cpu_ns)
+        self.samples += 1
+        self.phase_samples += 1
+        if self.interval:
+            # Absolute schedule, sleeping does not add up delays
+            time.sleep(max(0, self.phase_start + self.phase_samples*self.interval - time.monotonic()))
+        if self.record_cpu:
+            self.last_cpu_ns = time.process_time_ns()
+
+
+# Print process time of a phase and append it to results file, followed by percentiles and maximum of per-sample process times if recorded
+def report_phase(label, phase, description, column_header, num_vals, elapsed_ns, cpu_times=None):
+    print("Process time for {}:".format(description), elapsed_ns/10**6, "ms")
+    print("Process time for {} per value:".format(description), elapsed_ns/(num_vals * 10**6), "ms")
+    fields = [column_header, str(num_vals), str(elapsed_ns/10**6), str(elapsed_ns/(num_vals * 10**6))]
+    if cpu_times:
+        cpu_times = np.frombuffer(cpu_times, dtype=np.int64)
+        stats = [np.percentile(cpu_times, q) for q in CPU_PERCENTILES] + [cpu_times.max()]
+        print("Process time for {} per value (p{}, max):".format(description, ", p".join(str(q) for q in CPU_PERCENTILES)), ", ".join(str(stat/10**6) for stat in stats), "ms")
+        fields += [str(stat/10**6) for stat in stats]
+    with open("./results.csv", 'a') as rf:
+        rf.write(label + ", {},{}\n".format(phase, ",".join(fields)))
 
 
 def main():
     ################################################################
     # Preparations
     ################################################################
-    if len(sys.argv) < 3:
-        print("Please specify input file (including path) and column header, and number of values to be sent!")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Sender for experimental evaluation of archive-based covert channel.")
+    parser.add_argument("input_file", help="sensor data file (including path)")
+    parser.add_argument("column_header", help="column to examine")
+    parser.add_argument("num_vals", type=int, help="number of values to be sent per phase")
+    parser.add_argument("archive_fname", nargs='?', default=None, help="binary archive replacing archiving and neighbor mapping phases")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--per-sample-connections", action='store_true', help="open a new connection for every value (original mode)")
+    parser.add_argument("--batch-size", type=int, default=1, help="values per frame on persistent connection")
+    parser.add_argument("--stream-id", default=None, help="identify persistent connection by this id (required by fleet_server.py)")
+    parser.add_argument("--lookup", choices=["table", "dict"], default="table", help="nearest neighbor lookup by dense table or by map of archived values and bisection (original)")
+    parser.add_argument("--speedup", type=float, default=1, help="send values this many times faster than the sampling rate of 3.5 Hz, 0: as fast as possible (replay)")
+    parser.add_argument("--timestamps", action='store_true', help="precede each value by its timestamp on the virtual clock of the sensor (pass to server.py, too)")
+    parser.add_argument("--jitter", type=float, default=0, help="standard deviation of jitter added to timestamps (seconds)")
+    parser.add_argument("--histogram", action='store_true', help="also report median, 99th percentile and maximum of per-value process times")
+    args = parser.parse_args()
+    if args.batch_size > MAX_FRAME_VALUES:
+        parser.error("--batch-size exceeds {} values per frame".format(MAX_FRAME_VALUES))
+    if args.timestamps and args.per_sample_connections:
+        parser.error("--timestamps requires persistent connections")
 
     random.seed(2502)
 
     # Specify which column to examine
-    column_header = sys.argv[2]
-    num_vals = int(sys.argv[3])
+    column_header = args.column_header
+    num_vals = args.num_vals
+    archive_fname = args.archive_fname
+    if args.per_sample_connections:
+        sender = ConnectionPerSampleSender(args.host, args.port)
+        label = "archive-based cc"
+    else:
+        sender = StreamSender(args.host, args.port, args.batch_size, args.stream_id)
+        label = "archive-based cc stream"
+    if args.speedup != 1:
+        label += " replay x{}".format(args.speedup) if args.speedup else " replay max"
+    clock = VirtualClock(args.speedup, args.timestamps, args.jitter, args.histogram)
 
     print("Processing {} values from column {}...".format(num_vals, column_header))
 
-    # Read csv file with sensor values
-    raw_data = pd.read_csv(sys.argv[1])
-    input_data_total = raw_data[column_header].tolist()
+    # Read column of csv file with sensor values
+    input_data_total = sensorfile.load_columns(args.input_file, [column_header], cache_dir=None)[column_header].tolist()
     input_data = input_data_total[:num_vals]
 
     ################################################################
     # REGULAR OPERATION
     ################################################################
     start = time.process_time_ns()
-    # Send sensor values at 3.5Hz
+    clock.start_phase()
+    # Send sensor values at 3.5Hz (virtual clock)
     for datum in input_data:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            # Connect to server and send data
-            sock.connect((HOST, PORT))
-            sock.sendall(create_regular_output(datum))
-        time.sleep(1/3.5)
+        sender.send(clock.stamp(create_regular_output(datum)))
+        clock.tick()
+    sender.flush()
     end = time.process_time_ns()
-    print("Process time for regular operation:", (end-start)/10**6, "ms")
-    print("Process time for regular operation per value:", (end-start)/(num_vals * 10**6), "ms")
-    with open("./results.csv", 'a') as rf:
-        rf.write("archive-based cc, regular operation,{},{},{},{}\n".format(column_header, str(num_vals), str((end-start)/10**6), str((end-start)/(num_vals * 10**6))))
+    report_phase(label, "regular operation", "regular operation", column_header, num_vals, end-start, clock.cpu_times)
     ################################################################
 
-    archive = []
+    if archive_fname:
+        # Use archive of a previous archiving phase instead of archiving and neighbor mapping phases
+        values, nearest_lower, nearest_upper = np.load(archive_fname)
+        use_table = args.lookup == "table" and LookupTable.get_size(values) <= MAX_TABLE_SIZE
+        if not use_table:
+            archive, neighbors = load_archive(archive_fname)
+    else:
+        archive = []
 
-    ################################################################
-    # ARCHIVING PHASE
-    ################################################################
-    start = time.process_time_ns()
-    # Send sensor values at 3.5Hz, log into archive
-    for datum in input_data:
-        archive.append(round(datum*10000))
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            # Connect to server and send data
-            sock.connect((HOST, PORT))
-            sock.sendall(create_regular_output(datum))
-        time.sleep(1/3.5)
-    end = time.process_time_ns()
-    print("Process time for archiving phase:", (end-start)/10**6, "ms")
-    print("Process time for archiving phase per value:", (end-start)/(num_vals * 10**6), "ms")
-    with open("./results.csv", 'a') as rf:
-        rf.write("archive-based cc, archiving phase,{},{},{},{}\n".format(column_header, str(num_vals), str((end-start)/10**6), str((end-start)/(num_vals * 10**6))))
-    ################################################################
+        ################################################################
+        # ARCHIVING PHASE
+        ################################################################
+        start = time.process_time_ns()
+        clock.start_phase()
+        # Send sensor values at 3.5Hz (virtual clock), log into archive
+        for datum in input_data:
+            archive.append(round(datum*10000))
+            sender.send(clock.stamp(create_regular_output(datum)))
+            clock.tick()
+        sender.flush()
+        end = time.process_time_ns()
+        report_phase(label, "archiving phase", "archiving phase", column_header, num_vals, end-start, clock.cpu_times)
+        ################################################################
 
-    ################################################################
-    # NEIGHBOR MAPPING PHASE
-    ################################################################
-    start = time.process_time_ns()
-    archive = sorted(archive)
-    neighbors = {}
-    gapgen = (filterfalse(set(archive).__contains__, count(archive[0])))
-    lower = archive[0] - 1
-    upper = next(gapgen)
-    for value in archive:
-        nearest, lower, upper = find_nearest_new(value, gapgen, lower, upper)
-        neighbors[value] = nearest
-    end = time.process_time_ns()
-    print("Process time for neighbor mapping phase:", (end-start)/10**6, "ms")
-    print("Process time for neighbor mapping phase per value:", (end-start)/(num_vals * 10**6), "ms")
-    with open("./results.csv", 'a') as rf:
-        rf.write("archive-based cc, mapping phase,{},{},{},{}\n".format(column_header, str(num_vals), str((end-start)/10**6), str((end-start)/(num_vals * 10**6))))
-    ################################################################
+        ################################################################
+        # NEIGHBOR MAPPING PHASE
+        ################################################################
+        start = time.process_time_ns()
+        archive = sorted(archive)
+        values = np.unique(archive)
+        nearest_lower, nearest_upper = map_nearest_new(values)
+        use_table = args.lookup == "table" and LookupTable.get_size(values) <= MAX_TABLE_SIZE
+        if not use_table:
+            neighbors = {value: [lower] if lower == upper else [lower, upper] for value, lower, upper in zip(values.tolist(), nearest_lower.tolist(), nearest_upper.tolist())}
+        end = time.process_time_ns()
+        report_phase(label, "mapping phase", "neighbor mapping phase", column_header, num_vals, end-start)
+        ################################################################
     
+    if args.lookup == "table" and not use_table:
+        print("Range of archived values exceeds {} values, using map of archived values instead of lookup table".format(MAX_TABLE_SIZE))
+
     # Proceed to inputs for cc phase
     input_data = input_data_total[num_vals:num_vals*2]
+
+    if use_table:
+        ################################################################
+        # LOOKUP TABLE (completes neighbor mapping phase, reported separately)
+        ################################################################
+        # Peak memory allocated by the build (table and temporary arrays)
+        tracemalloc.start()
+        start = time.process_time_ns()
+        table = LookupTable(values, nearest_lower, nearest_upper)
+        end = time.process_time_ns()
+        build_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("Process time for building lookup table:", (end-start)/10**6, "ms ({} bytes, peak {} bytes during build)".format(table.nbytes, build_peak))
+        with open("./results.csv", 'a') as rf:
+            rf.write(label + ", lookup table build,{},{},{},{},{},{}\n".format(column_header, str(len(values)), str((end-start)/10**6), str((end-start)/(len(values) * 10**6)), str(table.nbytes), str(build_peak)))
+        start = time.process_time_ns()
+        for datum in input_data:
+            table.lookup(round(datum*10000))
+        end = time.process_time_ns()
+        print("Process time for lookups per value:", (end-start)/(num_vals * 10**6), "ms")
+        with open("./results.csv", 'a') as rf:
+            rf.write(label + ", lookup table lookup,{},{},{},{}\n".format(column_header, str(num_vals), str((end-start)/10**6), str((end-start)/(num_vals * 10**6))))
+        random_bits = get_random_bits(num_vals)
+        ################################################################
     
     # Prepare secret message
-    with open(SECRET_MESSAGE_FNAME, 'rb') as smf:
-        msg = smf.read()
-    msggen = get_secret_message_bit_gen(msg)
+    msggen = get_secret_message_bit_gen(read_secret_message(SECRET_MESSAGE_FNAME))
 
     ################################################################
     # COVERT CHANNEL PHASE
     ################################################################
     start = time.process_time_ns()
-    # Send sensor values at 3.5Hz, embed secret information
-    for datum in input_data:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            # Connect to server and send data
-            sock.connect((HOST, PORT))
-            sock.sendall(create_cc_data(datum, msggen, archive, neighbors))
-        time.sleep(1/3.5)
+    clock.start_phase()
+    # Send sensor values at 3.5Hz (virtual clock), embed secret information
+    if use_table:
+        for datum, random_bit in zip(input_data, random_bits):
+            sender.send(clock.stamp(create_cc_data_table(datum, next(msggen), table, random_bit)))
+            clock.tick()
+    else:
+        for datum in input_data:
+            sender.send(clock.stamp(create_cc_data(datum, msggen, archive, neighbors)))
+            clock.tick()
+    sender.flush()
     end = time.process_time_ns()
-    print("Process time for covert channel phase:", (end-start)/10**6, "ms")
-    print("Process time for covert channel phase per value:", (end-start)/(num_vals * 10**6), "ms")
-    with open("./results.csv", 'a') as rf:
-        rf.write("archive-based cc, active phase,{},{},{},{}\n".format(column_header, str(num_vals), str((end-start)/10**6), str((end-start)/(num_vals * 10**6))))
+    report_phase(label, "active phase", "covert channel phase", column_header, num_vals, end-start, clock.cpu_times)
     ################################################################
+    sender.close()
 
 
 if __name__ == "__main__":
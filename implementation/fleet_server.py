@@ -0,0 +1,137 @@
+'''
+Implements asyncio-based receiver for many concurrent sensor streams (fleet setting).
+'''
+
+
+import asyncio
+import sys
+import struct
+import time
+import json
+import argparse
+import resource
+
+
+# Match entries in client.py
+HOST = "132.176.77.133"
+PORT = 44544
+FRAME_HEADER = '!IQ'
+# Largest number of values per frame accepted, see server.py
+MAX_FRAME_VALUES = 2**20
+HELLO_HEADER = '!H'
+# Interval for reporting stream statistics (seconds)
+REPORT_INTERVAL = 10
+
+
+# Throughput and latency counters of one sensor stream
+class StreamStats:
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.values = 0
+        self.frames = 0
+        self.bytes = 0
+        self.first_ns = None
+        self.last_ns = None
+        self.latency_sum_ns = 0
+        self.latency_max_ns = 0
+        self.last_value = None
+        self.open = True
+
+    def update(self, values, nbytes, sent_ns):
+        now = time.time_ns()
+        if self.first_ns is None:
+            self.first_ns = now
+        self.last_ns = now
+        self.values += len(values)
+        self.frames += 1
+        self.bytes += nbytes
+        # Sender and receiver share the clock on loopback, otherwise clocks need to be synchronized
+        latency = now - sent_ns
+        self.latency_sum_ns += latency
+        self.latency_max_ns = max(self.latency_max_ns, latency)
+        if values:
+            self.last_value = values[-1]
+
+    def as_dict(self):
+        elapsed = (self.last_ns - self.first_ns) / 10**9 if self.frames > 1 else 0
+        return {"stream": self.stream_id, "open": self.open, "values": self.values, "frames": self.frames, "bytes": self.bytes,
+                "values_per_s": self.values / elapsed if elapsed else None,
+                "mean_latency_ms": self.latency_sum_ns / (self.frames * 10**6) if self.frames else None,
+                "max_latency_ms": self.latency_max_ns / 10**6, "last_value": self.last_value}
+
+
+# Receive hello (stream id) and frames of one sensor stream
+async def handle_stream(reader, writer, streams):
+    peer = writer.get_extra_info('peername')
+    try:
+        (id_length,) = struct.unpack(HELLO_HEADER, await reader.readexactly(struct.calcsize(HELLO_HEADER)))
+        stream_id = (await reader.readexactly(id_length)).decode()
+    except asyncio.IncompleteReadError:
+        writer.close()
+        return
+    if stream_id in streams and streams[stream_id].open:
+        stream_id = "{}@{}:{}".format(stream_id, *peer[:2])
+    stats = StreamStats(stream_id)
+    streams[stream_id] = stats
+    header_size = struct.calcsize(FRAME_HEADER)
+    try:
+        while True:
+            num_values, sent_ns = struct.unpack(FRAME_HEADER, await reader.readexactly(header_size))
+            if num_values > MAX_FRAME_VALUES:
+                print("Closing stream {}: malformed frame of {} values".format(stream_id, num_values), file=sys.stderr)
+                break
+            payload = await reader.readexactly(4*num_values)
+            stats.update([value for (value,) in struct.iter_unpack('!f', payload)], header_size + len(payload), sent_ns)
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        stats.open = False
+        writer.close()
+
+
+# Periodically print totals, optionally write statistics of every stream as json lines
+async def report(streams, interval, stats_file):
+    last_values = 0
+    while True:
+        await asyncio.sleep(interval)
+        all_stats = [stats.as_dict() for stats in list(streams.values())]
+        total_values = sum(stats["values"] for stats in all_stats)
+        latencies = [stats["mean_latency_ms"] for stats in all_stats if stats["mean_latency_ms"] is not None]
+        print(json.dumps({"time": time.time(), "streams": len(all_stats), "open_streams": sum(stats["open"] for stats in all_stats),
+                          "values": total_values, "values_per_s": (total_values - last_values) / interval,
+                          "mean_latency_ms": sum(latencies) / len(latencies) if latencies else None,
+                          "max_latency_ms": max((stats["max_latency_ms"] for stats in all_stats), default=None)}), flush=True)
+        last_values = total_values
+        if stats_file:
+            with open(stats_file, 'a') as sf:
+                sf.write("".join(json.dumps(stats) + "\n" for stats in all_stats))
+
+
+# Allow as many open connections as permitted by hard limit
+def raise_open_files_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def serve(host, port, interval, stats_file):
+    streams = {}
+    server = await asyncio.start_server(lambda reader, writer: handle_stream(reader, writer, streams), host, port, backlog=4096)
+    async with server:
+        await asyncio.gather(server.serve_forever(), report(streams, interval, stats_file))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receiver for many concurrent sensor streams.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--interval", type=float, default=REPORT_INTERVAL, help="reporting interval (seconds)")
+    parser.add_argument("--stats-file", default=None, help="append statistics of every stream to this file (json lines)")
+    args = parser.parse_args()
+
+    raise_open_files_limit()
+    try:
+        # Interrupt with Ctrl-C
+        asyncio.run(serve(args.host, args.port, args.interval, args.stats_file))
+    except KeyboardInterrupt:
+        pass
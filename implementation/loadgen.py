@@ -0,0 +1,118 @@
+'''
+Simulates many sensors in one process, each streaming over its own persistent connection (load generator for fleet_server.py).
+'''
+
+
+import asyncio
+import sys
+import argparse
+import time
+import json
+import random
+import numpy as np
+from client import HOST, PORT, SECRET_MESSAGE_FNAME, create_regular_output, create_cc_data, create_hello, create_frame, map_nearest_new, get_secret_message_bit_gen
+from fleet_server import raise_open_files_limit
+# Importable after client, which adds the repository root to the module search path
+from ccarchive import sensorfile
+
+
+# Sampling rate of each sensor (Hz)
+RATE = 3.5
+
+
+# Archiving and neighbor mapping phase for given values, as in client.py
+def build_archive(values):
+    archive = sorted(round(datum*10000) for datum in values)
+    unique_values = np.unique(archive)
+    nearest_lower, nearest_upper = map_nearest_new(unique_values)
+    neighbors = {value: [lower] if lower == upper else [lower, upper] for value, lower, upper in zip(unique_values.tolist(), nearest_lower.tolist(), nearest_upper.tolist())}
+    return archive, neighbors
+
+
+# Stream values of one sensor for given duration, returns number of values sent
+async def run_sensor(stream_id, values, encode, host, port, rate, batch_size, duration, start_delay):
+    await asyncio.sleep(start_delay)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(create_hello(stream_id))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    batch = []
+    sent = 0
+    while loop.time() - start < duration:
+        batch.append(encode(values[sent % len(values)]))
+        sent += 1
+        if len(batch) >= batch_size:
+            writer.write(create_frame(batch, time.time_ns()))
+            batch = []
+            await writer.drain()
+        # Absolute schedule, sleeping does not add up delays
+        await asyncio.sleep(max(0, start + sent/rate - loop.time()) if rate > 0 else 0)
+    if batch:
+        writer.write(create_frame(batch, time.time_ns()))
+    await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+    return sent
+
+
+async def run_fleet(args):
+    # Same loader as client.py
+    raw_data = sensorfile.load_columns(args.input_file, args.columns, cache_dir=None)
+    with open(SECRET_MESSAGE_FNAME, 'rb') as smf:
+        msg = smf.read()
+    # Archive of each column is built from the first values, remaining values are sent
+    streams = {}
+    for column_header in args.columns:
+        column = raw_data[column_header].tolist()
+        if args.mode == "cc":
+            archive, neighbors = build_archive(column[:args.archive_values])
+            streams[column_header] = (column[args.archive_values:], archive, neighbors)
+        else:
+            streams[column_header] = (column, None, None)
+        if not streams[column_header][0]:
+            print("No values of column {} left to send ({} values, {} used for the archive)!".format(column_header, len(column), args.archive_values if args.mode == "cc" else 0))
+            sys.exit(1)
+
+    tasks = []
+    for i in range(args.sensors):
+        column_header = args.columns[i % len(args.columns)]
+        values, archive, neighbors = streams[column_header]
+        # Sensors of the same column start at different positions
+        offset = (i // len(args.columns)) * args.offset % len(values)
+        values = values[offset:] + values[:offset]
+        if args.mode == "cc":
+            msggen = get_secret_message_bit_gen(msg)
+            encode = lambda datum, msggen=msggen, archive=archive, neighbors=neighbors: create_cc_data(datum, msggen, archive, neighbors)
+        else:
+            encode = create_regular_output
+        # Spread connection setup and sending over one sampling interval
+        start_delay = i / args.sensors / args.rate if args.rate > 0 else 0
+        tasks.append(run_sensor("sensor{}/{}".format(i, column_header), values, encode, args.host, args.port, args.rate, args.batch_size, args.duration, start_delay))
+
+    start = time.perf_counter()
+    start_cpu = time.process_time_ns()
+    sent = await asyncio.gather(*tasks)
+    end_cpu = time.process_time_ns()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"sensors": args.sensors, "mode": args.mode, "values": sum(sent), "elapsed_s": elapsed, "values_per_s": sum(sent) / elapsed,
+                      "process_time_per_value_ms": (end_cpu - start_cpu) / (max(sum(sent), 1) * 10**6)}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many sensors streaming to fleet_server.py.")
+    parser.add_argument("input_file", help="sensor data file (including path)")
+    parser.add_argument("--columns", nargs='+', default=["Flow rate (mL/min)", "R1 (MOhm)"], help="columns to send, assigned to sensors in turn")
+    parser.add_argument("--sensors", type=int, default=100, help="number of simulated sensors")
+    parser.add_argument("--mode", choices=["regular", "cc"], default="regular", help="send regular values or values with embedded cc")
+    parser.add_argument("--archive-values", type=int, default=10000, help="values used for the archive of each column in cc mode")
+    parser.add_argument("--rate", type=float, default=RATE, help="values per second of each sensor (0: as fast as possible)")
+    parser.add_argument("--batch-size", type=int, default=1, help="values per frame")
+    parser.add_argument("--duration", type=float, default=60, help="duration (seconds)")
+    parser.add_argument("--offset", type=int, default=1000, help="offset between start positions of sensors of the same column")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    random.seed(2502)
+    raise_open_files_limit()
+    asyncio.run(run_fleet(args))
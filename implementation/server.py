@@ -6,14 +6,29 @@ Implements receiver for experimental evaluation of archive-based covert channel.
 import socketserver
 import struct
 import binascii
+import argparse
+import sys
+import threading
 
 
 # Match entries in client.py
 #HOST = "192.168.137.31"
 HOST = "132.176.77.133"
 PORT = 44544
+FRAME_HEADER = '!IQ'
+# Largest number of values per frame accepted, connections sending larger (i.e., malformed) frames are closed
+MAX_FRAME_VALUES = 2**20
+# Format of values on persistent connections, values are preceded by timestamps (ns) if client.py sends them (--timestamps)
+VALUE_FORMAT = '!f'
+TIMESTAMPED_VALUE_FORMAT = '!qf'
+# Number of received values logged at once on persistent connections
+LOG_EVERY = 100
+# Write received values as raw big-endian float32 instead of text (e.g., piped into ../detector.py)
+RAW_OUTPUT = False
+raw_output_lock = threading.Lock()
 
 
+# Receives a single value per connection
 class MyTCPHandler(socketserver.BaseRequestHandler):
     def handle(self):
         self.data = self.request.recv(4)
@@ -23,7 +38,71 @@ class MyTCPHandler(socketserver.BaseRequestHandler):
         print(struct.unpack('!f', self.data))
 
 
+# Receives frames of values over a persistent connection
+class StreamHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        values = []
+        header_size = struct.calcsize(FRAME_HEADER)
+        value_size = struct.calcsize(VALUE_FORMAT)
+        while True:
+            header = self.rfile.read(header_size)
+            if len(header) < header_size:
+                break
+            num_values, _ = struct.unpack(FRAME_HEADER, header)
+            if num_values > MAX_FRAME_VALUES:
+                # E.g., values with timestamps while not expecting them (--timestamps) or hello message of fleet_server.py clients
+                print("Closing connection from {}: malformed frame of {} values".format(self.client_address[0], num_values), file=sys.stderr)
+                break
+            payload = self.rfile.read(value_size*num_values)
+            if len(payload) < value_size*num_values:
+                # Connection closed within frame
+                break
+            if RAW_OUTPUT:
+                # Values only, without timestamps
+                write_raw(payload if VALUE_FORMAT == '!f' else b"".join(value[-4:] for (value,) in struct.iter_unpack("{}s".format(value_size), payload)))
+                continue
+            values.extend(" ".join(str(field) for field in reversed(item)) for item in struct.iter_unpack(VALUE_FORMAT, payload))
+            if len(values) >= LOG_EVERY:
+                log_values(values, self.client_address)
+                values = []
+        log_values(values, self.client_address)
+
+
+# Write received values (followed by their timestamps if sent) in one block
+def log_values(values, client_address):
+    if values:
+        sys.stdout.write("".join("{} {}\n".format(client_address[0], value) for value in values))
+        sys.stdout.flush()
+
+
+# Write received payload unchanged, connections do not interleave within a payload
+def write_raw(payload):
+    with raw_output_lock:
+        sys.stdout.buffer.write(payload)
+        sys.stdout.buffer.flush()
+
+
+class ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
 if __name__ == "__main__":
-    with socketserver.TCPServer((HOST, PORT), MyTCPHandler) as server:
+    parser = argparse.ArgumentParser(description="Receiver for experimental evaluation of archive-based covert channel.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--per-sample-connections", action='store_true', help="expect a new connection for every value (original mode)")
+    parser.add_argument("--raw-output", action='store_true', help="write received values as raw big-endian float32 to standard output (persistent connections only)")
+    parser.add_argument("--timestamps", action='store_true', help="expect timestamps preceding values (see client.py --timestamps)")
+    args = parser.parse_args()
+    RAW_OUTPUT = args.raw_output
+    if args.timestamps:
+        VALUE_FORMAT = TIMESTAMPED_VALUE_FORMAT
+
+    if args.per_sample_connections:
+        server = socketserver.TCPServer((args.host, args.port), MyTCPHandler)
+    else:
+        server = ThreadingTCPServer((args.host, args.port), StreamHandler)
+    with server:
         # Interrupt with Ctrl-C
         server.serve_forever()
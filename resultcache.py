@@ -0,0 +1,154 @@
+'''
+Content-addressed cache of grid cell results: summary rows, per-cell files, and record (see resultstore.py) of a cell are
+stored under a hash of all inputs of the cell and reused as long as none of them changes. Least recently used entries are evicted above a size limit.
+'''
+
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import ccarchive
+from ccarchive import evaluation
+from ccarchive import channel
+from ccarchive import archivefile
+from ccarchive import sensorfile
+
+
+RESULT_CACHE_DIR = "./result_cache/"
+# Size limit of all cached entries (bytes)
+MAX_CACHE_BYTES = 2*1024**3
+# Increase to invalidate all entries after changing the layout of entries
+CACHE_FORMAT_VERSION = 2
+META_FNAME = "cell.json"
+ERRORS_FNAME = "errors.npy"
+# Modules whose code determines results of a cell
+CODE_MODULES = [evaluation, channel, archivefile, sensorfile]
+
+# Hashes of files already hashed by this process, keyed by path, size and modification time
+_file_hashes = {}
+
+
+def hash_file(fname):
+    stat = os.stat(fname)
+    file_id = (os.path.abspath(fname), stat.st_size, stat.st_mtime_ns)
+    if file_id not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(fname, 'rb') as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                digest.update(block)
+        _file_hashes[file_id] = digest.hexdigest()
+    return _file_hashes[file_id]
+
+
+# Hash of the code producing results, changes with any modification of the modules (including their constants)
+def get_code_version():
+    digest = hashlib.sha256()
+    for module in CODE_MODULES:
+        digest.update(hash_file(module.__file__).encode())
+    digest.update(np.__version__.encode())
+    return digest.hexdigest()
+
+
+# Key of a grid cell: hash of sensor data file contents, column, archive contents, parameters, secret message, and code
+def get_cell_key(sensor_fname, column_header, archive_fname, period, nn_threshold, options):
+    inputs = {"format": CACHE_FORMAT_VERSION, "sensor_data": hash_file(sensor_fname), "data_filename": os.path.splitext(os.path.basename(sensor_fname))[0],
+              "column": column_header, "archive": hash_file(archive_fname), "period": period, "nn_threshold": nn_threshold,
+              "random_neighbors": channel.RANDOM_NEIGHBORS, "seed": channel.RANDOM_SEED, "secret_message": hash_file(ccarchive.SECRET_MESSAGE_FNAME),
+              "code": get_code_version(), "options": options}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+# Paths of files are stored relative to the results directory of the cell (respath) or the top-level results directory (subdir)
+def to_relative(fname, respath, subdir):
+    for base, name in [(respath, "respath"), (subdir, "subdir")]:
+        rel = os.path.relpath(fname, base)
+        if not rel.startswith(os.pardir):
+            return name, rel
+    raise ValueError("{} is not located in results directory!".format(fname))
+
+
+def from_relative(base, rel, respath, subdir):
+    return os.path.join(respath if base == "respath" else subdir, rel)
+
+
+class ResultCache:
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def get_entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    # Restore per-cell files of cached cell to respath, returns summary rows and record, or None if cell is not cached
+    def load(self, key, respath, subdir):
+        entry_dir = self.get_entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, META_FNAME)) as mf:
+                meta = json.load(mf)
+            for i, (base, rel) in enumerate(meta["files"]):
+                fname = from_relative(base, rel, respath, subdir)
+                os.makedirs(os.path.dirname(fname), exist_ok=True)
+                shutil.copyfile(os.path.join(entry_dir, str(i)), fname)
+            record = meta["record"]
+            record["errors"] = np.load(os.path.join(entry_dir, ERRORS_FNAME))
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Not cached or evicted concurrently
+            return None
+        # Mark as recently used
+        os.utime(os.path.join(entry_dir, META_FNAME))
+        return [(from_relative(base, rel, respath, subdir), header, line) for base, rel, header, line in meta["rows"]], record
+
+    # Store summary rows, per-cell files, and record of a cell, entry becomes visible at once when complete
+    def store(self, key, rows, record, files, respath, subdir):
+        entry_dir = self.get_entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = "{}.{}.tmp".format(entry_dir, os.getpid())
+        os.makedirs(tmp_dir)
+        for i, fname in enumerate(files):
+            shutil.copyfile(fname, os.path.join(tmp_dir, str(i)))
+        np.save(os.path.join(tmp_dir, ERRORS_FNAME), record["errors"])
+        meta = {"files": [to_relative(fname, respath, subdir) for fname in files],
+                "rows": [to_relative(fname, respath, subdir) + (header, line) for fname, header, line in rows],
+                "record": {name: value for name, value in record.items() if name != "errors"},
+                "bytes": sum(os.path.getsize(fname) for fname in files) + os.path.getsize(os.path.join(tmp_dir, ERRORS_FNAME))}
+        with open(os.path.join(tmp_dir, META_FNAME), 'w') as mf:
+            json.dump(meta, mf)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Stored concurrently by another process
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Reuse cached results of a cell, otherwise compute them by compute(outputs) returning rows and record and appending per-cell files to outputs
+    def run(self, key, respath, subdir, compute):
+        cached = self.load(key, respath, subdir)
+        if cached is not None:
+            print("Reusing cached results for {}...".format(respath))
+            return cached
+        outputs = []
+        rows, record = compute(outputs)
+        self.store(key, rows, record, outputs, respath, subdir)
+        return rows, record
+
+    # Remove least recently used entries until all entries fit into size limit
+    def evict(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            meta_fname = os.path.join(self.get_entry_dir(key), META_FNAME)
+            try:
+                with open(meta_fname) as mf:
+                    entries.append((os.path.getmtime(meta_fname), json.load(mf)["bytes"], key))
+            except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+                continue
+        total_bytes = sum(num_bytes for _, num_bytes, _ in entries)
+        for _, num_bytes, key in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(self.get_entry_dir(key), ignore_errors=True)
+            total_bytes -= num_bytes
@@ -0,0 +1,171 @@
+'''
+Consolidated results store: results of all grid cells in one SQLite database (WAL mode), parameters of cells are indexed columns.
+Usage: python resultstore.py <database> <output path> [<subdir>] (regenerates legacy csv layout of results written to subdir)
+'''
+
+
+import sys
+import os
+import sqlite3
+import numpy as np
+import ccarchive
+
+
+# Cells written per transaction
+BATCH_SIZE = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    id INTEGER PRIMARY KEY,
+    subdir TEXT NOT NULL,
+    period TEXT NOT NULL,
+    threshold INTEGER NOT NULL,
+    data_filename TEXT NOT NULL,
+    date TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    bits_transmitted INTEGER,
+    total_no_values INTEGER,
+    coverage REAL,
+    mape REAL,
+    max_error REAL,
+    entropy_reg REAL,
+    entropy_cc REAL,
+    errorlist_format TEXT,
+    UNIQUE (subdir, period, threshold, data_filename, column_name)
+);
+CREATE INDEX IF NOT EXISTS cells_parameters ON cells (period, threshold, column_name, date);
+CREATE TABLE IF NOT EXISTS bigrams (
+    cell_id INTEGER NOT NULL REFERENCES cells (id),
+    stream TEXT NOT NULL,
+    num_bits INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    first INTEGER NOT NULL,
+    second INTEGER NOT NULL,
+    occurences INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bigrams_cell ON bigrams (cell_id, stream, num_bits);
+CREATE TABLE IF NOT EXISTS compressibilities (
+    cell_id INTEGER NOT NULL REFERENCES cells (id),
+    stream TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    compressibility REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS compressibilities_cell ON compressibilities (cell_id, stream, codec);
+CREATE TABLE IF NOT EXISTS windowed_entropies (
+    cell_id INTEGER NOT NULL REFERENCES cells (id),
+    window_end INTEGER NOT NULL,
+    entropy_reg REAL,
+    entropy_cc REAL
+);
+CREATE INDEX IF NOT EXISTS windowed_entropies_cell ON windowed_entropies (cell_id);
+-- Relative errors of a cell as array of float64 (native byte order)
+CREATE TABLE IF NOT EXISTS errors (
+    cell_id INTEGER PRIMARY KEY REFERENCES cells (id),
+    rel_err BLOB NOT NULL
+);
+"""
+CHILD_TABLES = ["bigrams", "compressibilities", "windowed_entropies", "errors"]
+
+
+class ResultStore:
+    def __init__(self, fname, batch_size=BATCH_SIZE):
+        self.conn = sqlite3.connect(fname)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self.pending = []
+
+    # Add results of a cell (record filled by ccarchive.evaluate()), written with the next batch
+    def add(self, subdir, record):
+        self.pending.append((subdir, record))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    # Write pending cells in one transaction
+    def flush(self):
+        with self.conn:
+            for subdir, record in self.pending:
+                self.insert(subdir, record)
+        self.pending = []
+
+    # Insert results of a cell, replacing previous results of the same cell
+    def insert(self, subdir, record):
+        cell = record["cell"]
+        summary = record["summary"]
+        key = (subdir, cell["period"], cell["threshold"], cell["data_filename"], cell["column"])
+        for (cell_id,) in self.conn.execute("SELECT id FROM cells WHERE subdir = ? AND period = ? AND threshold = ? AND data_filename = ? AND column_name = ?", key).fetchall():
+            for table in CHILD_TABLES:
+                self.conn.execute("DELETE FROM {} WHERE cell_id = ?".format(table), (cell_id,))
+            self.conn.execute("DELETE FROM cells WHERE id = ?", (cell_id,))
+        cell_id = self.conn.execute("INSERT INTO cells (subdir, period, threshold, data_filename, column_name, date, bits_transmitted, total_no_values, coverage, "
+                                    "mape, max_error, entropy_reg, entropy_cc, errorlist_format) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                    key + (cell["date"], summary["bits_transmitted"], summary["total_no_values"], summary["bits_transmitted"]/summary["total_no_values"],
+                                           summary["mape"], summary["max_error"], summary["entropy_reg"], summary["entropy_cc"], summary["errorlist_format"])).lastrowid
+        bigram_rows = []
+        indices = {}
+        for stream, num_bits, first, second, occurences in record["bigrams"]:
+            idx = indices.get((stream, num_bits), 0)
+            indices[(stream, num_bits)] = idx + 1
+            bigram_rows.append((cell_id, stream, num_bits, idx, first, second, occurences))
+        self.conn.executemany("INSERT INTO bigrams VALUES (?, ?, ?, ?, ?, ?, ?)", bigram_rows)
+        self.conn.executemany("INSERT INTO compressibilities VALUES (?, ?, ?, ?, ?)",
+                              [(cell_id, stream, codec, i*ccarchive.COMPRESSION_STRIDE, value)
+                               for stream, compressibilities in record["compressibilities"].items() for codec, values in compressibilities.items() for i, value in enumerate(values)])
+        if record["windowed_entropies"]:
+            self.conn.executemany("INSERT INTO windowed_entropies VALUES (?, ?, ?, ?)", [(cell_id,) + tuple(row) for row in record["windowed_entropies"]])
+        self.conn.execute("INSERT INTO errors VALUES (?, ?)", (cell_id, np.asarray(record["errors"], dtype=np.float64).tobytes()))
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Write results in legacy csv layout to outpath (in place of the top-level results directory), cells in order of insertion
+    def export(self, outpath, subdir=None):
+        self.flush()
+        query = "SELECT id, period, threshold, date, column_name, bits_transmitted, total_no_values, mape, max_error, entropy_reg, entropy_cc, errorlist_format FROM cells"
+        cells = self.conn.execute(query + (" WHERE subdir = ? ORDER BY id" if subdir is not None else " ORDER BY id"), (subdir,) if subdir is not None else ()).fetchall()
+        with ccarchive.ResultWriter() as writer:
+            for cell_id, period, threshold, date, column_header, values_used, total_no_values, mape, max_err, entropy_reg, entropy_cc, errorlist_format in cells:
+                respath = os.path.join(outpath, period, str(threshold))
+                column_fname = ccarchive.get_column_fname(column_header)
+                ccarchive.prepare_result_dirs(respath)
+                writer.write(ccarchive.get_summary_rows(respath, outpath, date, column_fname, period, threshold, values_used, total_no_values, mape, max_err, entropy_reg, entropy_cc))
+                (rel_err,) = self.conn.execute("SELECT rel_err FROM errors WHERE cell_id = ?", (cell_id,)).fetchone()
+                ccarchive.write_errorlist(np.frombuffer(rel_err, dtype=np.float64), os.path.join(respath, "errorlists", date + '_' + column_fname), errorlist_format)
+                self.export_bigrams(cell_id, respath, column_fname, date)
+                self.export_compressibilities(cell_id, respath, column_fname, date)
+                windowed_entropies = self.conn.execute("SELECT window_end, entropy_reg, entropy_cc FROM windowed_entropies WHERE cell_id = ? ORDER BY window_end", (cell_id,)).fetchall()
+                if windowed_entropies:
+                    os.makedirs(os.path.join(respath, "entropies"), exist_ok=True)
+                    ends, entropies_reg, entropies_cc = np.array(windowed_entropies).T
+                    ccarchive.write_windowed_entropies(ends.astype(np.int64), entropies_reg, entropies_cc, os.path.join(respath, "entropies/entropies_{}_{}.csv".format(column_fname, date)))
+
+    def export_bigrams(self, cell_id, respath, column_fname, date):
+        bigrams = {}
+        for stream, num_bits, first, second, occurences in self.conn.execute("SELECT stream, num_bits, first, second, occurences FROM bigrams WHERE cell_id = ? ORDER BY stream, num_bits, idx", (cell_id,)):
+            bigrams.setdefault((stream, num_bits), {})[(first, second)] = occurences
+        for (stream, num_bits), bigram_occurences in bigrams.items():
+            ccarchive.write_bigrams(bigram_occurences, os.path.join(respath, "bigrams/bigrams_{}_{}_{}_{}.csv".format(stream, column_fname, date, num_bits)))
+
+    def export_compressibilities(self, cell_id, respath, column_fname, date):
+        compressibilities = {}
+        for stream, codec, value in self.conn.execute("SELECT stream, codec, compressibility FROM compressibilities WHERE cell_id = ? ORDER BY rowid", (cell_id,)):
+            compressibilities.setdefault(stream, {}).setdefault(codec, []).append(value)
+        for stream, codec_compressibilities in compressibilities.items():
+            ccarchive.write_compressibilities(codec_compressibilities, os.path.join(respath, "compressibilities/compressibilities_{}_{}_{}.csv".format(stream, column_fname, date)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Please specify database and output path!")
+        sys.exit(1)
+    with ResultStore(sys.argv[1]) as store:
+        store.export(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
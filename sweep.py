@@ -0,0 +1,183 @@
+'''
+Evaluates archive-based covert channel for a whole parameter grid from data loaded once, optionally in parallel.
+'''
+
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import ccarchive
+from ccarchive import archivefile
+from ccarchive import sensorfile
+from ccarchive import instrument
+import resultcache
+import resultstore
+import detectability
+
+
+# Parameter grid, matches evalccarchive.sh
+VAL_DIR = "./sensor_data/"
+FNAMES = ["20161013_143355.csv", "20161014_184659.csv", "20161016_053656.csv"]
+PERIODS = ["0.0001", "0.001", "0.01", "0.1", "1", "10"]
+NN_THRESHOLDS = [10, 100, 1000, 10000]
+COLUMN_HEADERS = ["Flow rate (mL/min)", "R1 (MOhm)"]
+
+
+# Locate archives of all periods and columns, archive of a period is expected in <outpath>/<period>days/
+def get_archive_fnames(outpath, periods, column_headers):
+    return {(period, column_header): ccarchive.get_archive_fname(os.path.join(outpath, "{}days".format(period)), ccarchive.get_column_fname(column_header))
+            for period in periods for column_header in column_headers}
+
+
+# Load archives, binary archives are memory-mapped and thus shared by all processes
+def load_archives(archive_fnames):
+    return {key: archivefile.read_archive(fname) for key, fname in archive_fnames.items()}
+
+
+# Load all sensor data files, return data of given columns for each file
+# Files are parsed only once, later calls load the cached columns (see sensorfile.py)
+def load_sensor_files(val_dir, fnames, column_headers):
+    return {fname: ccarchive.load_sensor_data(os.path.join(val_dir, fname), column_headers) for fname in fnames}
+
+
+# Read-only data shared by all grid cells, set once per (worker) process
+_shared = {}
+
+
+# Options are passed to ccarchive.evaluate() as keyword arguments, tracer_config configures instrumentation (see instrument.py)
+# Results of cells are cached if cache_config (keyword arguments of resultcache.ResultCache) is given
+def init_shared(archive_fnames, val_dir, fnames, column_headers, secret_bits, options, tracer_config, cache_config):
+    instrument.configure(**tracer_config)
+    _shared["archive_fnames"] = archive_fnames
+    _shared["val_dir"] = val_dir
+    _shared["cache"] = resultcache.ResultCache(**cache_config) if cache_config is not None else None
+    with instrument.tracer.stage("load_archives", items=len(archive_fnames)):
+        _shared["archives"] = load_archives(archive_fnames)
+    with instrument.tracer.stage("load_sensor_files", items=len(fnames)):
+        _shared["sensor_data"] = load_sensor_files(val_dir, fnames, column_headers)
+    _shared["secret_bits"] = secret_bits
+    _shared["options"] = options
+
+
+# Evaluate a single grid cell from shared data, returns summary rows and record of results
+# Nearest neighbors (see ccarchive.find_neighbors()) are shared by cells differing in threshold only, get_neighbors() returns them
+def compute_cell(outpath, period, nn_threshold, fname, column_header, outputs=None, get_neighbors=None):
+    respath = os.path.join(outpath, "{}days".format(period), str(nn_threshold))
+    record = {}
+    rows = ccarchive.evaluate(_shared["sensor_data"][fname][column_header], os.path.splitext(fname)[0], column_header, respath,
+                              _shared["archives"][(period, column_header)], _shared["secret_bits"], outpath, "{}days".format(period), nn_threshold,
+                              outputs=outputs, record=record, neighbors=get_neighbors() if get_neighbors else None, **_shared["options"])
+    return rows, record
+
+
+# Evaluate a single grid cell (or reuse its cached results), returns summary rows and record of results
+def evaluate_cell(outpath, period, nn_threshold, fname, column_header, get_neighbors=None):
+    respath = os.path.join(outpath, "{}days".format(period), str(nn_threshold))
+    compute = lambda outputs: compute_cell(outpath, period, nn_threshold, fname, column_header, outputs, get_neighbors)
+    with instrument.tracer.cell(period=period, threshold=nn_threshold, file=fname, column=column_header):
+        cache = _shared["cache"]
+        if cache is None:
+            return compute(None)
+        key = resultcache.get_cell_key(os.path.join(_shared["val_dir"], fname), column_header, _shared["archive_fnames"][(period, column_header)],
+                                       "{}days".format(period), nn_threshold, _shared["options"])
+        return cache.run(key, respath, outpath, compute)
+
+
+# Evaluate grid cells of all thresholds for one period, file, and column, nearest neighbors are searched once (only if a cell is not cached)
+# Returns summary rows and record of results for each threshold
+def evaluate_thresholds(outpath, period, nn_thresholds, fname, column_header):
+    neighbors = []
+    def get_neighbors():
+        if not neighbors:
+            with instrument.tracer.stage("find_neighbors", items=len(_shared["sensor_data"][fname][column_header])):
+                neighbors.append(ccarchive.find_neighbors(_shared["sensor_data"][fname][column_header], _shared["archives"][(period, column_header)]))
+        return neighbors[0]
+    return [evaluate_cell(outpath, period, nn_threshold, fname, column_header, get_neighbors) for nn_threshold in nn_thresholds]
+
+
+# Run evaluation for every combination of period, threshold, file, and column from shared in-memory data
+# Column headers may be glob patterns (e.g., "R*"), selected by headers of the first file
+# Cells are spread over worker processes, summary rows are written by this process in grid order
+# Results are cached unless cache_config is None, written to the results store store_fname if given, and written to csv files unless csv_files is False
+# Detectability statistics of all cells (see detectability.py) are written to one summary table if tests is set (python detectability.py computes them from a results store)
+def run_sweep(outpath, val_dir, fnames, periods, nn_thresholds, column_headers, workers=None, cache_config={}, store_fname=None, csv_files=True, tests=True, **options):
+    column_headers = sensorfile.select_columns(os.path.join(val_dir, fnames[0]), column_headers)
+    archive_fnames = get_archive_fnames(outpath, periods, column_headers)
+    # Parse sensor data files (all columns of a file in one pass) before workers load their cached columns
+    for fname in fnames:
+        sensorfile.load_columns(os.path.join(val_dir, fname), column_headers)
+    secret_bits = ccarchive.get_secret_message_bits(ccarchive.read_secret_message(ccarchive.SECRET_MESSAGE_FNAME))
+    # Cells differing in threshold only are evaluated together
+    groups = [(outpath, period, nn_thresholds, fname, column_header) for period in periods for fname in fnames for column_header in column_headers]
+
+    shared_args = (archive_fnames, val_dir, fnames, column_headers, secret_bits, dict(options, csv_files=csv_files), instrument.tracer.get_config(), cache_config)
+    store = resultstore.ResultStore(store_fname) if store_fname else None
+
+    with ccarchive.ResultWriter() as writer:
+        records = []
+        def write(rows, record):
+            if csv_files:
+                writer.write(rows)
+            if store:
+                store.add(outpath, record)
+            records.append(record)
+
+        if workers == 1:
+            init_shared(*shared_args)
+            results = [evaluate_thresholds(*group) for group in groups]
+        else:
+            # Shared data is handed to each worker once, groups only carry their parameters, archives and sensor data columns are mapped by the workers
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_shared, initargs=shared_args) as executor:
+                results = list(executor.map(evaluate_thresholds, *zip(*groups)))
+        # Summary rows in grid order
+        results = {(period, fname, column_header): result for (_, period, _, fname, column_header), result in zip(groups, results)}
+        for period in periods:
+            for i in range(len(nn_thresholds)):
+                for fname in fnames:
+                    for column_header in column_headers:
+                        write(*results[(period, fname, column_header)][i])
+        if tests and csv_files and records:
+            with instrument.tracer.stage("detectability", items=len(records)):
+                header, lines = detectability.compute_statistics(records)
+                writer.write([(os.path.join(outpath, detectability.STATISTICS_FNAME), header, line) for line in lines])
+    if store:
+        store.close()
+    if cache_config is not None:
+        resultcache.ResultCache(**cache_config).evict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate archive-based covert channel for a parameter grid.")
+    parser.add_argument("outpath", help="results directory containing the archives of the archiving phase")
+    parser.add_argument("--val-dir", default=VAL_DIR, help="directory containing the sensor data files")
+    parser.add_argument("--files", nargs='+', default=FNAMES, help="sensor data files to examine")
+    parser.add_argument("--periods", nargs='+', default=PERIODS, help="archiving periods in days")
+    parser.add_argument("--thresholds", nargs='+', type=int, default=NN_THRESHOLDS, help="nearest neighbor thresholds")
+    parser.add_argument("--columns", nargs='+', default=COLUMN_HEADERS, help="column headers or glob patterns (e.g., 'R*') of columns to examine")
+    parser.add_argument("--codecs", nargs='+', default=ccarchive.COMPRESSION_CODECS, choices=list(ccarchive.COMPRESSORS), help="codecs used for compressibility")
+    parser.add_argument("--errorlist-format", choices=["csv", "npy"], default=ccarchive.ERRORLIST_FORMAT, help="format of lists of relative errors")
+    parser.add_argument("--entropy-window", type=int, default=None, help="also compute entropies over time for windows of this size")
+    parser.add_argument("--entropy-step", type=int, default=None, help="values between windows (default: window size, i.e. block entropy)")
+    parser.add_argument("--mmap-streams", action='store_true', default=None, help="write sensor data stream files as memory-mapped arrays (see ccarchive.channel.MMAP_STREAMS)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs, 1: run in this process)")
+    parser.add_argument("--store", default=None, help="also write all results to this SQLite database (see resultstore.py)")
+    parser.add_argument("--no-csv", action='store_true', help="do not write summary and per-cell csv files (e.g., if results are written to --store)")
+    parser.add_argument("--no-tests", action='store_true', help="do not compute detectability statistics of all cells (see detectability.py)")
+    parser.add_argument("--no-cache", action='store_true', help="recompute all cells instead of reusing cached results")
+    parser.add_argument("--cache-dir", default=resultcache.RESULT_CACHE_DIR, help="directory of cached results")
+    parser.add_argument("--cache-size", type=float, default=resultcache.MAX_CACHE_BYTES/1024**2, help="size limit of cached results (MiB)")
+    parser.add_argument("--trace", default=None, help="write timings of stages to this file (json lines, one line per grid cell)")
+    parser.add_argument("--profile", nargs='+', default=None, help="run given stages under cProfile ('all' for every stage)")
+    parser.add_argument("--tracemalloc", action='store_true', default=None, help="record peak memory allocated during each stage")
+    args = parser.parse_args()
+
+    instrument.configure(args.trace, args.profile, use_tracemalloc=args.tracemalloc)
+
+    cache_config = None if args.no_cache else {"cache_dir": args.cache_dir, "max_bytes": int(args.cache_size*1024**2)}
+    run_sweep(args.outpath, args.val_dir, args.files, args.periods, args.thresholds, args.columns, args.workers, cache_config, args.store, not args.no_csv, not args.no_tests,
+              codecs=args.codecs, errorlist_format=args.errorlist_format, entropy_window=args.entropy_window, entropy_step=args.entropy_step,
+              mmap_streams=args.mmap_streams)
+
+
+if __name__ == "__main__":
+    main()
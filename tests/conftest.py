@@ -0,0 +1,31 @@
+'''
+Synthetic stream and archive shared by the tests (fixed seeds).
+'''
+
+
+import numpy as np
+import pytest
+from ccarchive import channel
+from ccarchive import collect_data
+
+
+SEED = 2502
+NUM_SAMPLES = 5000
+MAX_STEP = 50
+
+
+# Random walk of sensor values with 4 decimal places, archive of about half of their range (values, lower, upper)
+@pytest.fixture
+def stream():
+    rng = np.random.default_rng(SEED)
+    data_as_int = 2000000 + np.cumsum(rng.integers(-MAX_STEP, MAX_STEP+1, NUM_SAMPLES))
+    low, high = int(data_as_int.min()), int(data_as_int.max())
+    values = low + np.flatnonzero(rng.random(high - low + 1) < 0.5)
+    lower, upper = collect_data.map_nearest_new(values)
+    return {"data": (data_as_int / 10000).tolist(), "archive": np.array([values, lower, upper]),
+            "secret_bits": rng.integers(0, 2, NUM_SAMPLES, dtype=np.uint8), "rng": rng}
+
+
+@pytest.fixture
+def deterministic(monkeypatch):
+    monkeypatch.setattr(channel, "RANDOM_NEIGHBORS", False)
@@ -0,0 +1,98 @@
+'''
+Incremental archive builder of the archiving phase (ArchiveBuilder): snapshots of periods, persisted state and its reuse.
+'''
+
+
+import os
+import numpy as np
+import pytest
+from ccarchive import collect_data
+
+
+pytest.importorskip("pandas")
+
+COLUMN_NAMES = ["Flow rate (mL/min)", "R1 (MOhm)"]
+FILE_NAMES = ["20161013_143355.csv", "20161014_184659.csv", "20161016_053656.csv"]
+
+
+def write_csv(fname, rng, mtime_ns=10**18):
+    with open(fname, 'w') as f:
+        f.write("Time (s),{}\n".format(",".join(COLUMN_NAMES)))
+        for i, (flow, r1) in enumerate(zip(rng.integers(0, 500, 50) / 10000, rng.integers(0, 500, 50) / 100)):
+            f.write("{},{},{}\n".format(i, flow, r1))
+    os.utime(fname, ns=(mtime_ns, mtime_ns))
+
+
+# Sensor data files in temporary directory, returns archived values of each column for each period (number of files) as expected
+@pytest.fixture
+def sensor_data(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(collect_data, "VAL_DIR", str(tmp_path / "sensor_data"))
+    monkeypatch.setattr(collect_data, "ARCHIVE_CACHE_DIR", str(tmp_path / "archive_cache"))
+    os.makedirs(collect_data.VAL_DIR)
+    os.makedirs(collect_data.ARCHIVE_CACHE_DIR)
+    rng = np.random.default_rng(2502)
+    for name in FILE_NAMES:
+        write_csv(os.path.join(collect_data.VAL_DIR, name), rng)
+    return {num_files: collect_data.collect_days(FILE_NAMES[:num_files], COLUMN_NAMES) for num_files in range(1, len(FILE_NAMES) + 1)}
+
+
+# Names of files ingested by builders
+@pytest.fixture
+def ingested(monkeypatch):
+    names = []
+    ingest = collect_data.ArchiveBuilder.ingest
+    def counting_ingest(self, name):
+        names.append(name)
+        ingest(self, name)
+    monkeypatch.setattr(collect_data.ArchiveBuilder, "ingest", counting_ingest)
+    return names
+
+
+def assert_values_equal(values, expected):
+    assert len(values) == len(expected)
+    for column_values, column_expected in zip(values, expected):
+        np.testing.assert_array_equal(column_values, column_expected)
+
+
+def test_snapshots_of_periods(sensor_data, ingested):
+    builder = collect_data.ArchiveBuilder(COLUMN_NAMES)
+    for num_files in range(1, len(FILE_NAMES) + 1):
+        assert_values_equal(builder.collect(FILE_NAMES[:num_files]), sensor_data[num_files])
+    # Each file ingested once, shorter periods are served from their snapshots
+    assert ingested == FILE_NAMES
+    assert_values_equal(builder.collect(FILE_NAMES[:1]), sensor_data[1])
+    assert ingested == FILE_NAMES
+
+
+def test_saved_state_reloaded(sensor_data, ingested):
+    builder = collect_data.ArchiveBuilder(COLUMN_NAMES)
+    builder.collect(FILE_NAMES[:1])
+    builder.collect(FILE_NAMES)
+    fnames = builder.save(FILE_NAMES[0])
+    assert fnames == [collect_data.get_builder_fname(FILE_NAMES[0], column_name) for column_name in COLUMN_NAMES]
+    del ingested[:]
+    loaded = collect_data.ArchiveBuilder.load(FILE_NAMES[0], COLUMN_NAMES)
+    assert sorted(loaded.snapshots) == [1, len(FILE_NAMES)]
+    assert_values_equal(loaded.collect(FILE_NAMES[:1]), sensor_data[1])
+    assert_values_equal(loaded.collect(FILE_NAMES), sensor_data[len(FILE_NAMES)])
+    assert ingested == []
+    # State of each column is reused by a builder of a single column
+    single = collect_data.ArchiveBuilder.load(FILE_NAMES[0], COLUMN_NAMES[1:])
+    assert_values_equal(single.collect(FILE_NAMES), sensor_data[len(FILE_NAMES)][1:])
+    assert ingested == []
+
+
+def test_saved_state_invalidated(sensor_data, ingested):
+    builder = collect_data.ArchiveBuilder(COLUMN_NAMES)
+    builder.collect(FILE_NAMES)
+    builder.save(FILE_NAMES[0])
+    # Column without saved state: empty builder
+    assert collect_data.ArchiveBuilder.load(FILE_NAMES[0], COLUMN_NAMES + ["R2 (MOhm)"]).file_ids == []
+    # Modified file: values are collected again
+    write_csv(os.path.join(collect_data.VAL_DIR, FILE_NAMES[1]), np.random.default_rng(1), mtime_ns=2*10**18)
+    expected = collect_data.collect_days(FILE_NAMES, COLUMN_NAMES)
+    del ingested[:]
+    loaded = collect_data.ArchiveBuilder.load(FILE_NAMES[0], COLUMN_NAMES)
+    assert_values_equal(loaded.collect(FILE_NAMES), expected)
+    assert ingested == FILE_NAMES
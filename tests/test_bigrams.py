@@ -0,0 +1,17 @@
+'''
+Bigrams of all numbers of last bits in one pass (compute_bigrams_multi) compared with compute_bigrams of each stream file.
+'''
+
+
+import ccarchive
+from ccarchive import channel
+
+
+def test_compute_bigrams_multi_matches_compute_bigrams(stream, tmp_path):
+    fname = str(tmp_path / "reg.bin")
+    regular_stream = channel.create_regular_output(stream["data"], fname)
+    for num_bits, result in zip(ccarchive.NUM_LAST_DIGITS, ccarchive.compute_bigrams_multi(regular_stream, ccarchive.NUM_LAST_DIGITS)):
+        absolute_occurences, bigram_occurences = ccarchive.compute_bigrams(fname, 2**num_bits)
+        assert result[0] == absolute_occurences
+        # Same bigrams in the same order (order of rows in bigram files)
+        assert list(result[1].items()) == list(bigram_occurences.items())
@@ -0,0 +1,27 @@
+'''
+Tests of the detectability summary (detectability.py) compared with scipy.
+'''
+
+
+import numpy as np
+import pytest
+import detectability
+
+
+SEED = 2502
+
+
+def test_ks_test_matches_ks_2samp():
+    stats = pytest.importorskip("scipy.stats")
+    rng = np.random.default_rng(SEED)
+    # Rows of 100 windows (exact p-values) and of 1000 windows, some windows missing
+    for num_windows in [100, 1000]:
+        a = rng.random((5, num_windows))
+        b = rng.random((5, num_windows)) + 0.05
+        a[0, num_windows // 2:] = np.nan
+        b[1, :10] = np.nan
+        statistic, p_value = detectability.ks_test(a, b)
+        for row_a, row_b, row_statistic, row_p_value in zip(a, b, statistic, p_value):
+            expected = stats.ks_2samp(row_a[~np.isnan(row_a)], row_b[~np.isnan(row_b)])
+            assert row_statistic == pytest.approx(expected.statistic, abs=1e-12)
+            assert row_p_value == expected.pvalue
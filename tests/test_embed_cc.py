@@ -0,0 +1,17 @@
+'''
+Vectorized embedding of the covert channel (embed_cc) compared with the scalar reference implementation (create_cc_data).
+'''
+
+
+import pytest
+from ccarchive import channel
+from ccarchive import archivefile
+
+
+@pytest.mark.parametrize("threshold", [10, 100, 10000])
+def test_embed_cc_matches_create_cc_data(stream, deterministic, tmp_path, threshold):
+    expected, expected_used = channel.create_cc_data(stream["data"], str(tmp_path / "cc.bin"), iter(stream["secret_bits"].tolist()),
+                                                     archivefile.archive_to_dict(stream["archive"]), threshold)
+    cc_data, values_used = channel.embed_cc(stream["data"], stream["secret_bits"], stream["archive"], threshold)
+    assert values_used == expected_used
+    assert channel.create_regular_output(cc_data, str(tmp_path / "cc_vectorized.bin")).tobytes() == expected.tobytes()
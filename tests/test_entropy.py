@@ -0,0 +1,30 @@
+'''
+Entropy of sensor values (compute_shannon_entropy) compared with scipy, and entropy of windows (compute_windowed_entropy).
+'''
+
+
+import numpy as np
+import pytest
+import ccarchive
+
+
+def test_shannon_entropy_matches_scipy(stream):
+    pd = pytest.importorskip("pandas")
+    stats = pytest.importorskip("scipy.stats")
+    for values in [stream["data"], [1.5]*100]:
+        # Former computation of compute_shannon_entropy()
+        expected = stats.entropy(pd.Series(values).value_counts(), base=2)
+        assert str(ccarchive.compute_shannon_entropy(values)) == str(expected)
+
+
+@pytest.mark.parametrize("window,step", [(500, 500), (500, 100), (333, 1)])
+def test_windowed_entropy_matches_entropy_of_each_window(stream, window, step):
+    symbols = ccarchive.get_symbols(stream["data"])
+    ends, entropies = ccarchive.compute_windowed_entropy(stream["data"], window, step)
+    expected_ends = list(range(window, len(symbols) + 1, step))
+    if step == window:
+        # Incomplete last block is omitted
+        expected_ends = expected_ends[:len(symbols) // window]
+    assert ends.tolist() == expected_ends
+    expected = [ccarchive.compute_shannon_entropy(symbols[end-window:end]) for end in expected_ends]
+    np.testing.assert_allclose(entropies, expected, rtol=0, atol=1e-9)
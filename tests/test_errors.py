@@ -0,0 +1,19 @@
+'''
+Relative errors of the covert channel stream (compute_relative_errors, summarize_relative_errors) compared with the former list computation.
+'''
+
+
+import ccarchive
+from ccarchive import channel
+
+
+def test_relative_errors_match_list_computation(stream, deterministic):
+    data = stream["data"][:]
+    data[:10] = [0.0]*10
+    cc_data, _ = channel.embed_cc(data, stream["secret_bits"], stream["archive"], 100)
+    cc_data = cc_data.tolist()
+    # Former computation of calculate_mape()
+    expected = [(abs(data[i]-cc_data[i])/abs(data[i])) for i in range(len(data)) if abs(data[i]) > 0]
+    rel_err = ccarchive.compute_relative_errors(data, cc_data)
+    assert rel_err.tolist() == expected
+    assert ccarchive.summarize_relative_errors(rel_err) == (100 * (sum(expected) / len(expected)), max(expected))
@@ -0,0 +1,39 @@
+'''
+Lookup table of the sender (implementation/client.py) compared with the map of archived values and bisection.
+'''
+
+
+import numpy as np
+import pytest
+from ccarchive import channel
+import client
+
+
+SEED = 2502
+
+
+# Also patched in the sender, which imports RANDOM_NEIGHBORS by name
+@pytest.fixture
+def deterministic(monkeypatch):
+    monkeypatch.setattr(channel, "RANDOM_NEIGHBORS", False)
+    monkeypatch.setattr(client, "RANDOM_NEIGHBORS", False)
+
+
+# Table built at once and in chunks (boundaries at archived and non-archived values)
+@pytest.mark.parametrize("chunk_size", [2**16, 7, 1])
+def test_lookup_table_matches_dict(deterministic, monkeypatch, chunk_size):
+    monkeypatch.setattr(client, "TABLE_CHUNK_SIZE", chunk_size)
+    rng = np.random.default_rng(SEED)
+    values = np.unique(2000000 + rng.integers(0, 2000, 1000))
+    nearest_lower, nearest_upper = client.map_nearest_new(values)
+    table = client.LookupTable(values, nearest_lower, nearest_upper)
+    assert table.nbytes == 4*client.LookupTable.get_size(values)
+    archive = values.tolist()
+    neighbors = {value: [lower] if lower == upper else [lower, upper] for value, lower, upper in zip(archive, nearest_lower.tolist(), nearest_upper.tolist())}
+    # All values within the range of the archive, and values below and above it
+    data_as_int = list(range(int(values[0]) - 20, int(values[-1]) + 21))
+    for secret_bit in [0, 1]:
+        for datum_int in data_as_int:
+            datum = datum_int / 10000
+            expected = client.create_cc_data(datum, iter([secret_bit]), archive, neighbors)
+            assert client.create_cc_data_table(datum, secret_bit, table, 0) == expected, datum_int
@@ -0,0 +1,22 @@
+'''
+Vectorized map of archived values to their nearest non-archived values (map_nearest_new) compared with find_nearest_new.
+'''
+
+
+from itertools import count, filterfalse
+from ccarchive import collect_data
+
+
+def test_map_nearest_new_matches_find_nearest_new(stream):
+    values = stream["archive"][0]
+    data = values.tolist()
+    # Gaps generated as in the archiving phase before map_nearest_new()
+    gapgen = (filterfalse(set(data).__contains__, count(data[0])))
+    lower = data[0] - 1
+    upper = next(gapgen)
+    expected = []
+    for datum in data:
+        nearest, lower, upper = collect_data.find_nearest_new(datum, gapgen, lower, upper)
+        expected.append(nearest)
+    nearest_lower, nearest_upper = collect_data.map_nearest_new(values)
+    assert [[low] if low == up else [low, up] for low, up in zip(nearest_lower.tolist(), nearest_upper.tolist())] == expected
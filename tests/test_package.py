@@ -0,0 +1,31 @@
+'''
+Lazy attributes of the package (ccarchive/__init__.py), each checked in a fresh interpreter.
+'''
+
+
+import os
+import subprocess
+import sys
+import pytest
+
+
+def run_python(code):
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.mark.parametrize("submodule", ["archivefile", "channel", "collect_data", "instrument", "sensorfile"])
+def test_submodule_without_evaluation(submodule):
+    result = run_python("import sys, ccarchive; ccarchive.{0}; print(ccarchive.{0}.__name__, 'ccarchive.evaluation' in sys.modules)".format(submodule))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["ccarchive." + submodule, "False"]
+
+
+def test_evaluation_attributes():
+    result = run_python("import ccarchive; print(ccarchive.evaluate is ccarchive.evaluation.evaluate)")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "True"
+
+
+def test_unknown_attribute():
+    result = run_python("import ccarchive; ccarchive.no_such_attribute")
+    assert "AttributeError" in result.stderr
@@ -0,0 +1,100 @@
+'''
+Cache of grid cell results (resultcache.py): key of a cell, reuse of cached results, and eviction of least recently used entries.
+'''
+
+
+import os
+import numpy as np
+import pytest
+import resultcache
+from ccarchive import channel
+from ccarchive import evaluation
+
+
+def write_file(fname, content, mtime_ns=10**18):
+    with open(fname, 'wb') as f:
+        f.write(content)
+    os.utime(fname, ns=(mtime_ns, mtime_ns))
+
+
+# Input files of a cell in temporary directory
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    fnames = {"sensor": str(tmp_path / "20161013_143355.csv"), "archive": str(tmp_path / "archive.npy"), "secret": str(tmp_path / "pseudos.bin.gpg")}
+    for name, fname in fnames.items():
+        write_file(fname, name.encode())
+    monkeypatch.setattr(evaluation, "SECRET_MESSAGE_FNAME", fnames["secret"])
+    return fnames
+
+
+def get_key(inputs, column_header="R1 (MOhm)", period="7days", nn_threshold=100, options={"mmap_streams": False}):
+    return resultcache.get_cell_key(inputs["sensor"], column_header, inputs["archive"], period, nn_threshold, options)
+
+
+def test_cell_key_changes_with_inputs(inputs, monkeypatch):
+    key = get_key(inputs)
+    assert get_key(inputs) == key
+    keys = [get_key(inputs, column_header="Flow rate (mL/min)"), get_key(inputs, period="14days"), get_key(inputs, nn_threshold=1000),
+            get_key(inputs, options={"mmap_streams": True})]
+    random_neighbors, random_seed = channel.RANDOM_NEIGHBORS, channel.RANDOM_SEED
+    monkeypatch.setattr(channel, "RANDOM_NEIGHBORS", not random_neighbors)
+    keys.append(get_key(inputs))
+    monkeypatch.setattr(channel, "RANDOM_NEIGHBORS", random_neighbors)
+    monkeypatch.setattr(channel, "RANDOM_SEED", random_seed + 1)
+    keys.append(get_key(inputs))
+    monkeypatch.setattr(channel, "RANDOM_SEED", random_seed)
+    assert get_key(inputs) == key
+    # Modified contents of each input file
+    for name in ["sensor", "archive", "secret"]:
+        write_file(inputs[name], b"modified " + name.encode(), mtime_ns=2*10**18)
+        keys.append(get_key(inputs))
+    assert len(set([key] + keys)) == len(keys) + 1
+
+
+# Computation of a cell writing one per-cell file, returns rows and record
+def make_compute(respath, calls, size=10):
+    def compute(outputs):
+        calls.append(respath)
+        fname = os.path.join(respath, "errors.csv")
+        os.makedirs(respath, exist_ok=True)
+        write_file(fname, b"x"*size)
+        outputs.append(fname)
+        return [(fname, "header\n", "line\n")], {"summary": {"mape": 1.0}, "errors": np.arange(3.0)}
+    return compute
+
+
+def test_cached_results_reused(tmp_path):
+    cache = resultcache.ResultCache(str(tmp_path / "cache"))
+    calls = []
+    subdir = str(tmp_path / "results")
+    respath = os.path.join(subdir, "7days", "100")
+    rows, record = cache.run("key", respath, subdir, make_compute(respath, calls))
+    # Results restored to another results directory without computing them again
+    other_subdir = str(tmp_path / "other_results")
+    other_respath = os.path.join(other_subdir, "7days", "100")
+    cached_rows, cached_record = cache.run("key", other_respath, other_subdir, make_compute(other_respath, calls))
+    assert calls == [respath]
+    assert cached_rows == [(os.path.join(other_respath, "errors.csv"), "header\n", "line\n")]
+    assert cached_record["summary"] == record["summary"]
+    np.testing.assert_array_equal(cached_record["errors"], record["errors"])
+    with open(os.path.join(other_respath, "errors.csv"), 'rb') as f:
+        assert f.read() == b"x"*10
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = resultcache.ResultCache(str(tmp_path / "cache"))
+    subdir = str(tmp_path / "results")
+    calls = []
+    for i, key in enumerate(["a", "b", "c"]):
+        respath = os.path.join(subdir, key)
+        cache.run(key, respath, subdir, make_compute(respath, calls, size=1000))
+        os.utime(os.path.join(cache.get_entry_dir(key), resultcache.META_FNAME), ns=(10**18 + i, 10**18 + i))
+    # Loading marks entry as recently used, so b is the least recently used entry
+    assert cache.load("a", os.path.join(subdir, "a"), subdir) is not None
+    # Size limit of two entries
+    cache.max_bytes = 2*(1000 + os.path.getsize(os.path.join(cache.get_entry_dir("a"), resultcache.ERRORS_FNAME)))
+    cache.evict()
+    assert sorted(os.listdir(cache.cache_dir)) == ["a", "c"]
+    cache.max_bytes = 0
+    cache.evict()
+    assert os.listdir(cache.cache_dir) == []
@@ -0,0 +1,52 @@
+'''
+Cached columns of sensor data files (ccarchive/sensorfile.py): reuse, invalidation and removal of stale files.
+'''
+
+
+import os
+import numpy as np
+import pytest
+from ccarchive import sensorfile
+
+
+pytest.importorskip("pandas")
+
+
+def write_csv(fname, rows, mtime_ns):
+    with open(fname, 'w') as f:
+        f.write("time,R1 (MOhm),R1 (MOhm) 2\n")
+        for i, (a, b) in enumerate(rows):
+            f.write("{},{},{}\n".format(i, a, b))
+    os.utime(fname, ns=(mtime_ns, mtime_ns))
+
+
+def test_cache_reused_and_invalidated(tmp_path):
+    fname = str(tmp_path / "20161013_143355.csv")
+    cache_dir = str(tmp_path / "column_cache")
+    write_csv(fname, [(1.5, 2.5), (1.25, 2.25)], 10**18)
+    columns = sensorfile.load_columns(fname, ["R1 (MOhm)"], cache_dir=cache_dir, chunk_size=1)
+    assert columns["R1 (MOhm)"].tolist() == [1.5, 1.25]
+    cache_fname = sensorfile.get_cache_fname(fname, "R1 (MOhm)", cache_dir)
+    assert os.listdir(cache_dir) == [os.path.basename(cache_fname)]
+    # Cached file is loaded, not rebuilt
+    mtime_ns = os.stat(cache_fname).st_mtime_ns
+    assert sensorfile.load_columns(fname, ["R1 (MOhm)"], cache_dir=cache_dir)["R1 (MOhm)"].tolist() == [1.5, 1.25]
+    assert os.stat(cache_fname).st_mtime_ns == mtime_ns
+    # Changed file: column is parsed again, cached column of previous version is removed
+    write_csv(fname, [(3.5, 4.5), (3.25, 4.25), (3.0, 4.0)], 2*10**18)
+    assert sensorfile.load_columns(fname, ["R1 (MOhm)"], cache_dir=cache_dir)["R1 (MOhm)"].tolist() == [3.5, 3.25, 3.0]
+    assert os.listdir(cache_dir) == [os.path.basename(sensorfile.get_cache_fname(fname, "R1 (MOhm)", cache_dir))]
+
+
+def test_cache_of_column_with_extended_name_kept(tmp_path):
+    fname = str(tmp_path / "20161013_143355.csv")
+    cache_dir = str(tmp_path / "column_cache")
+    write_csv(fname, [(1.5, 2.5), (1.25, 2.25)], 10**18)
+    # Cache prefix of the second column starts with cache prefix of the first column
+    assert sensorfile.get_cache_prefix(fname, "R1 (MOhm) 2", cache_dir).startswith(sensorfile.get_cache_prefix(fname, "R1 (MOhm)", cache_dir))
+    sensorfile.load_columns(fname, ["R1 (MOhm) 2"], cache_dir=cache_dir)
+    columns = sensorfile.load_columns(fname, ["R1 (MOhm)"], cache_dir=cache_dir)
+    assert columns["R1 (MOhm)"].tolist() == [1.5, 1.25]
+    assert sorted(os.listdir(cache_dir)) == sorted(os.path.basename(sensorfile.get_cache_fname(fname, column_header, cache_dir))
+                                                   for column_header in ["R1 (MOhm)", "R1 (MOhm) 2"])
+    np.testing.assert_array_equal(np.load(sensorfile.get_cache_fname(fname, "R1 (MOhm) 2", cache_dir)), [2.5, 2.25])